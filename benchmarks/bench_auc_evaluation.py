@@ -0,0 +1,60 @@
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+import sklearn.metrics as metrics
+
+import stage_loader  # noqa: F401
+from auc_evaluation import AucEvaluation
+
+METHODS = ("roc_auc_score", "vectorized")
+
+
+def make_scored_sample(n_rows, n_segments, positive_rate=0.08, seed=0):
+    # Scores rounded to 3 decimals, so ties are as common as in the probabilities of a forest
+    rng = np.random.default_rng(seed)
+    y_values = (rng.random(n_rows) < positive_rate).astype(np.int8)
+    scores = np.round(np.clip(rng.normal(0.3 + 0.15 * y_values, 0.15), 0, 1), 3)
+    df_segments = pd.DataFrame({"CODMES": rng.choice(np.arange(202301, 202301 + n_segments), n_rows),
+                                "FLAG_LIMA_PROVINCIA": pd.Categorical(rng.choice(["Lima", "Provincia"], n_rows))})
+    return y_values, scores, df_segments
+
+
+def _evaluate_roc_auc_score(y_values, scores, df_segments, n_bootstrap, seed):
+    # What the evaluation would cost as one roc_auc_score call per replicate and segment
+    rng = np.random.default_rng(seed)
+    segment_positions = [np.arange(len(y_values))] + [positions for col in df_segments.columns
+                                                      for positions in df_segments.groupby(col, observed=True).indices.values()]
+    for positions in segment_positions:
+        metrics.roc_auc_score(y_values[positions], scores[positions])
+        for _ in range(n_bootstrap):
+            sample_positions = positions[rng.integers(0, len(positions), len(positions))]
+            metrics.roc_auc_score(y_values[sample_positions], scores[sample_positions])
+
+
+def run_benchmark(n_rows_list=(10000, 50000), n_segments=6, n_bootstrap=200, n_jobs_list=(1, 2), methods=METHODS):
+    results = []
+    for n_rows in n_rows_list:
+        y_values, scores, df_segments = make_scored_sample(n_rows, n_segments)
+        for method in methods:
+            for n_jobs in (n_jobs_list if method == "vectorized" else [1]):
+                start = time.perf_counter()
+                if method == "vectorized":
+                    AucEvaluation(n_bootstrap, n_jobs=n_jobs).evaluate({"sample": (y_values, scores, df_segments)})
+                else:
+                    _evaluate_roc_auc_score(y_values, scores, df_segments, n_bootstrap, 0)
+                seconds = time.perf_counter() - start
+                n_aucs = (1 + n_segments + 2) * (n_bootstrap + 1)
+                results.append({"method": method, "n_rows": n_rows, "n_jobs": n_jobs, "n_aucs": n_aucs,
+                                "seconds": seconds, "aucs_per_second": n_aucs / seconds})
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows_list=(10000, 50000), n_segments=6, n_bootstrap=200, n_jobs_list=(1, 2), methods=METHODS):
+    run_benchmark(list(n_rows_list), n_segments, n_bootstrap, list(n_jobs_list), list(methods))
+
+if __name__ == "__main__":
+    fire.Fire(main)
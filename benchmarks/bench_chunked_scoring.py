@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import time
+
+import fire
+import pandas as pd
+
+from stage_loader import load_stage
+from process_utils import peak_rss_mb, run_command
+
+
+def prepare(work_path, n_rows, n_cols):
+    from sklearn.ensemble import RandomForestClassifier
+    from model_store import ModelArtifact
+    from preprocess_transform import PreprocessTransform
+    from synthetic_data import make_application_data
+
+    df_data, x_cols = make_application_data(n_rows, n_cols)
+    output_path_train = os.path.join(work_path, "train")
+
+    preprocess_transform = PreprocessTransform(x_cols, df_data[x_cols].mean().values, {col: str(df_data[col].dtype) for col in x_cols})
+    df_data_train = df_data.head(20000)
+    best_model = RandomForestClassifier(n_estimators=50, max_depth=6, min_samples_leaf=100, random_state=0)
+    best_model.fit(df_data_train[x_cols].fillna(df_data_train[x_cols].mean()), df_data_train["TARGET"])
+    ModelArtifact.save(f"{output_path_train}/models/best_model", best_model, preprocess_transform)
+
+    input_path = os.path.join(work_path, "score_input.csv")
+    df_data.to_csv(input_path, index=False)
+    print(json.dumps([input_path, output_path_train]))
+
+
+def score(input_path, output_path_train, chunk_size=0, n_jobs=1):
+    score_module = load_stage("5-score-model.py")
+    score_model_instance = score_module.ScoreModel(output_path_train)
+    output_path = os.path.dirname(input_path)
+    start = time.perf_counter()
+    if chunk_size:
+        n_rows = score_model_instance.score_preprocess_model_chunked(input_path, f"{output_path}/df_data_score_pred.csv",
+                                                                     f"{output_path}/y_pred_score.csv", chunk_size, n_jobs)
+    else:
+        df_data_score_pred, y_pred = score_model_instance.score_preprocess_model(pd.read_csv(input_path))
+        df_data_score_pred.to_csv(f"{output_path}/df_data_score_pred.csv")
+        y_pred.to_csv(f"{output_path}/y_pred_score.csv")
+        n_rows = len(y_pred)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"chunk_size": chunk_size or None, "n_jobs": n_jobs, "n_rows": n_rows, "seconds": seconds,
+                      "rows_per_second": n_rows / seconds, "peak_rss_mb": peak_rss_mb(include_children=True)}))
+
+
+def run_benchmark(n_rows=500000, n_cols=60, chunk_sizes=(10000, 50000, 200000), n_jobs=1):
+    results = []
+    with tempfile.TemporaryDirectory() as work_path:
+        # Data generation and every configuration run in fresh interpreters: ru_maxrss survives fork + exec on Linux,
+        # so this parent process has to stay small for the child measurements to reflect that run alone
+        input_path, output_path_train = run_command(os.path.abspath(__file__), "prepare", work_path, n_rows, n_cols)
+        for chunk_size in [0] + list(chunk_sizes):
+            results.append(run_command(os.path.abspath(__file__), "score", input_path, output_path_train,
+                                        f"--chunk_size={chunk_size}", f"--n_jobs={n_jobs}"))
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows=500000, n_cols=60, chunk_sizes=(10000, 50000, 200000), n_jobs=1):
+    run_benchmark(n_rows, n_cols, list(chunk_sizes), n_jobs)
+
+if __name__ == "__main__":
+    fire.Fire({"run": main, "prepare": prepare, "score": score})
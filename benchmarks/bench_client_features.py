@@ -0,0 +1,82 @@
+import os
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+
+import stage_loader  # noqa: F401
+from client_month_aggregation import ClientMonthAggregation
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+CATEGORY_COLS = ["TIPO_REQUERIMIENTO2", "DICTAMEN", "PRODUCTO_SERVICIO_2"]
+
+
+def _enlarge(df_data, scale, id_offset):
+    # Each copy gets its own client ids, so the number of clients grows with the number of events
+    df_enlarged = pd.concat([df_data] * scale, ignore_index=True)
+    df_enlarged["ID_CORRELATIVO"] = df_enlarged["ID_CORRELATIVO"].to_numpy() + np.repeat(np.arange(scale) * id_offset, len(df_data))
+    return df_enlarged
+
+
+def _groupby_client_features(df_events, df_clients, client_month_aggregation, windows):
+    # Reference implementation: one groupby per window and column, pivoted and merged onto the clients table
+    categories = client_month_aggregation.get_categories()
+    event_months = (df_events["CODMES"] // 100) * 12 + df_events["CODMES"] % 100 - 1
+    df_features = df_clients[["ID_CORRELATIVO", "CODMES"]].copy()
+    for reference_codmes in df_clients["CODMES"].unique():
+        reference_month = (reference_codmes // 100) * 12 + reference_codmes % 100 - 1
+        for window in windows:
+            df_window = df_events[(event_months > reference_month - window) & (event_months <= reference_month)]
+            df_counts = [df_window.groupby("ID_CORRELATIVO").size().rename(f"NRO_REQ_ULT{window}M")]
+            for col in CATEGORY_COLS:
+                df_pivot = df_window.groupby(["ID_CORRELATIVO", col], observed=True).size().unstack(fill_value=0)
+                df_counts.append(df_pivot.reindex(columns=categories[col], fill_value=0).add_prefix(f"{col}_{window}_"))
+            df_features = df_features.merge(pd.concat(df_counts, axis=1).reset_index(), on="ID_CORRELATIVO", how="left")
+    return df_features.fillna(0)
+
+
+def _time_call(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(scales=(1, 10, 100), events_per_client_scales=(1, 10), groupby_max_events=2000000, sample="oot", windows=(1, 3, 6)):
+    df_events_sample = pd.read_csv(os.path.join(DATA_PATH, f"{sample}_requerimientos_sample.csv"),
+                                   usecols=["ID_CORRELATIVO", "CODMES"] + CATEGORY_COLS, dtype={col: "category" for col in CATEGORY_COLS})
+    df_clients_sample = pd.read_csv(os.path.join(DATA_PATH, f"{sample}_clientes_sample.csv"), usecols=["ID_CORRELATIVO", "CODMES"])
+    id_offset = 10 ** int(np.ceil(np.log10(max(df_events_sample["ID_CORRELATIVO"].max(), df_clients_sample["ID_CORRELATIVO"].max()) + 1)))
+    results = []
+    client_month_aggregation = ClientMonthAggregation(CATEGORY_COLS, windows=windows)
+    client_month_aggregation.fit_categories(df_events_sample)
+    for scale in scales:
+        df_clients = _enlarge(df_clients_sample, scale, id_offset)
+        for events_per_client_scale in events_per_client_scales:
+            # Repeating the enlarged events keeps the clients fixed and makes the history of each client longer
+            df_events = pd.concat([_enlarge(df_events_sample, scale, id_offset)] * events_per_client_scale, ignore_index=True)
+            aggregation_seconds, df_features = _time_call(client_month_aggregation.compute_features, df_events, df_clients)
+
+            groupby_seconds, features_match = None, None
+            if len(df_events) <= groupby_max_events:
+                groupby_seconds, df_groupby = _time_call(_groupby_client_features, df_events, df_clients, client_month_aggregation, windows)
+                features_match = bool(np.array_equal(df_features.to_numpy(),
+                                                      df_groupby.drop(columns=["ID_CORRELATIVO", "CODMES"]).to_numpy()))
+
+            results.append({"scale": scale, "events_per_client_scale": events_per_client_scale, "n_events": len(df_events),
+                            "n_clients": len(df_clients), "n_features": df_features.shape[1],
+                            "groupby_seconds": groupby_seconds, "aggregation_seconds": aggregation_seconds,
+                            "events_per_second": len(df_events) / aggregation_seconds,
+                            "speedup": groupby_seconds / aggregation_seconds if groupby_seconds else None,
+                            "features_match": features_match})
+            del df_events, df_features
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(scales=(1, 10, 100), events_per_client_scales=(1, 10), groupby_max_events=2000000, sample="oot", windows=(1, 3, 6)):
+    run_benchmark(list(scales), list(events_per_client_scales), groupby_max_events, sample, list(windows))
+
+if __name__ == "__main__":
+    fire.Fire(main)
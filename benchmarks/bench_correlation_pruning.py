@@ -0,0 +1,102 @@
+import tempfile
+import time
+
+import fire
+import pandas as pd
+
+from stage_loader import load_stage
+from synthetic_data import make_application_data
+
+
+# The implementation before CorrelationPruning, kept verbatim apart from the stage methods becoming functions
+def _legacy_compute_correlation_pairs(df_data, x_cols, correlation_cutoff):
+    corr_matrix = df_data[x_cols].corr()
+    corr_matrix_abs = corr_matrix.abs()
+    so = corr_matrix_abs.unstack()
+    df_corr_pairs_abs = pd.DataFrame(so).reset_index()
+    df_corr_pairs_abs.columns = ["variable_1", "variable_2", "corr"]
+    df_corr_pairs_abs = df_corr_pairs_abs[df_corr_pairs_abs["corr"] < 1]
+    df_corr_pairs_abs_cutoff = df_corr_pairs_abs[df_corr_pairs_abs["corr"] >= correlation_cutoff]
+    return df_corr_pairs_abs_cutoff
+
+
+def _legacy_find_variable_bivariate_auc(df_bivariate_analysis, variable_name):
+    return df_bivariate_analysis[df_bivariate_analysis["variable"] == variable_name]["bivariate_auc"].iloc[0]
+
+
+def _legacy_find_bivariate_auc_high_correlation_pairs(df_bivariate_analysis, df_corr_pairs_abs_cutoff):
+    df_corr_pairs_abs_cutoff_bivariate = df_corr_pairs_abs_cutoff.copy()
+    auc_1_list, auc_2_list = [], []
+    for index, row in df_corr_pairs_abs_cutoff.iterrows():
+        auc_1_list.append(_legacy_find_variable_bivariate_auc(df_bivariate_analysis, row["variable_1"]))
+        auc_2_list.append(_legacy_find_variable_bivariate_auc(df_bivariate_analysis, row["variable_2"]))
+    df_corr_pairs_abs_cutoff_bivariate["bivariate_auc_1"] = auc_1_list
+    df_corr_pairs_abs_cutoff_bivariate["bivariate_auc_2"] = auc_2_list
+    return df_corr_pairs_abs_cutoff_bivariate
+
+
+def _legacy_filter_high_correlation_pairs(df_corr_pairs_abs_cutoff_bivariate):
+    vars_selected = []
+    for index, row in df_corr_pairs_abs_cutoff_bivariate.iterrows():
+        var_selected = row["variable_1"]
+        if (row["bivariate_auc_2"] > row["bivariate_auc_1"]):
+            var_selected = row["variable_2"]
+        vars_selected.append(var_selected)
+    return list(set(vars_selected))
+
+
+def _legacy_correlation_pruning(df_data, x_cols, df_bivariate_analysis, correlation_cutoff):
+    # Returns the correlated pairs and the variables winning them, which the selection of both implementations is built from
+    df_corr_pairs_abs_cutoff = _legacy_compute_correlation_pairs(df_data, x_cols, correlation_cutoff)
+    df_corr_pairs_abs_cutoff_bivariate = _legacy_find_bivariate_auc_high_correlation_pairs(df_bivariate_analysis, df_corr_pairs_abs_cutoff)
+    return df_corr_pairs_abs_cutoff_bivariate, _legacy_filter_high_correlation_pairs(df_corr_pairs_abs_cutoff_bivariate)
+
+
+def _get_pairs(df_corr_pairs):
+    return {frozenset(pair) for pair in zip(df_corr_pairs["variable_1"], df_corr_pairs["variable_2"])}
+
+
+def _pruning(preprocess_data_instance, df_data, x_cols, df_bivariate_analysis):
+    df_corr_pairs_abs_cutoff = preprocess_data_instance.preprocess_compute_correlation_pairs(df_data, x_cols)
+    df_corr_pairs_abs_cutoff_bivariate = preprocess_data_instance._find_bivariate_auc_high_correlation_pairs(df_bivariate_analysis,
+                                                                                                            df_corr_pairs_abs_cutoff)
+    return df_corr_pairs_abs_cutoff_bivariate, preprocess_data_instance._filter_high_correlation_pairs(df_corr_pairs_abs_cutoff_bivariate)
+
+
+def run_benchmark(n_rows=5000, n_cols_list=(100, 1000, 5000), legacy_max_cols=5000, sample_rows=None):
+    preprocess_module = load_stage("1-preprocess-dataset-train.py")
+    results = []
+    with tempfile.TemporaryDirectory() as output_path:
+        preprocess_data_instance = preprocess_module.PreprocessData(output_path)
+        preprocess_data_instance._correlation_sample_rows = sample_rows
+        for n_cols in n_cols_list:
+            df_data, x_cols = make_application_data(n_rows, n_cols)
+            df_data, df_bivariate_analysis = preprocess_data_instance.preprocess_screen_features(df_data, x_cols, "TARGET")
+
+            start = time.perf_counter()
+            df_pairs, x_cols_selected = _pruning(preprocess_data_instance, df_data, x_cols, df_bivariate_analysis)
+            pruning_seconds = time.perf_counter() - start
+
+            legacy_seconds, pairs_match, selection_matches = None, None, None
+            if n_cols <= legacy_max_cols:
+                start = time.perf_counter()
+                df_pairs_legacy, x_cols_selected_legacy = _legacy_correlation_pruning(df_data, x_cols, df_bivariate_analysis,
+                                                                                      preprocess_data_instance._correlation_cutoff)
+                legacy_seconds = time.perf_counter() - start
+                pairs_match = _get_pairs(df_pairs_legacy) == _get_pairs(df_pairs)
+                selection_matches = set(x_cols_selected_legacy) == set(x_cols_selected)
+
+            results.append({"n_rows": n_rows, "n_cols": n_cols, "n_pairs": len(df_pairs), "n_cols_selected": len(x_cols_selected),
+                            "legacy_seconds": legacy_seconds, "pruning_seconds": pruning_seconds,
+                            "speedup": legacy_seconds / pruning_seconds if legacy_seconds else None,
+                            "pairs_match": pairs_match, "selection_matches": selection_matches})
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows=5000, n_cols_list=(100, 1000, 5000), legacy_max_cols=5000, sample_rows=None):
+    run_benchmark(n_rows, list(n_cols_list), legacy_max_cols, sample_rows)
+
+if __name__ == "__main__":
+    fire.Fire(main)
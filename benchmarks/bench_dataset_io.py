@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+
+import stage_loader  # noqa: F401
+from dataset_io import DatasetIO
+from synthetic_data import make_application_data
+
+
+def _available_formats():
+    data_formats = ["csv", "npy"]
+    try:
+        import pyarrow  # noqa: F401
+        data_formats += ["parquet", "feather"]
+    except ImportError:
+        pass
+    return data_formats
+
+
+def _disk_size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, file_name)) for file_name in os.listdir(path)) / 1024 ** 2
+    return os.path.getsize(path) / 1024 ** 2
+
+
+def _time_call(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(n_rows=200000, n_cols=120, n_subset_cols=20):
+    df_data, x_cols = make_application_data(n_rows, n_cols)
+    df_data["NAME_CONTRACT_TYPE"] = np.where(df_data["TARGET"] == 1, "Cash loans", "Revolving loans")
+    subset_cols = x_cols[:n_subset_cols] + ["TARGET"]
+    results = []
+    with tempfile.TemporaryDirectory() as work_path:
+        for data_format in _available_formats():
+            dataset_io = DatasetIO(data_format=data_format)
+            dataset_path = os.path.join(work_path, f"application_data_{data_format}")
+            save_seconds, path = _time_call(dataset_io.save_dataset, df_data, dataset_path)
+            load_seconds, df_loaded = _time_call(dataset_io.load_dataset, dataset_path)
+            load_subset_seconds, _df_subset = _time_call(dataset_io.load_dataset, dataset_path, columns=subset_cols)
+            results.append({"format": data_format, "n_rows": n_rows, "n_cols": df_data.shape[1],
+                            "save_seconds": save_seconds, "load_seconds": load_seconds,
+                            "load_subset_seconds": load_subset_seconds, "size_mb": _disk_size_mb(path),
+                            "dtypes_preserved": df_loaded.dtypes.equals(df_data.dtypes)})
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows=200000, n_cols=120, n_subset_cols=20):
+    run_benchmark(n_rows, n_cols, n_subset_cols)
+
+if __name__ == "__main__":
+    fire.Fire(main)
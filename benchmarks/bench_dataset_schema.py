@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import time
+
+import fire
+import pandas as pd
+
+from stage_loader import load_stage
+from process_utils import peak_rss_mb, run_command
+from dataset_io import DatasetIO
+from dataset_schema import DatasetSchema
+
+# Text columns of the application table, plus the range and region codes of the client table
+TEXT_COLS = ["NAME_CONTRACT_TYPE", "CODE_GENDER", "FLAG_OWN_CAR", "FLAG_OWN_REALTY", "NAME_TYPE_SUITE", "NAME_INCOME_TYPE",
+             "NAME_EDUCATION_TYPE", "NAME_FAMILY_STATUS", "NAME_HOUSING_TYPE", "OCCUPATION_TYPE", "WEEKDAY_APPR_PROCESS_START",
+             "ORGANIZATION_TYPE", "FONDKAPREMONT_MODE", "HOUSETYPE_MODE", "WALLSMATERIAL_MODE", "EMERGENCYSTATE_MODE",
+             "RANG_INGRESO", "FLAG_LIMA_PROVINCIA"]
+FORMATS = ("csv", "npy")
+STEPS = ("load", "preprocess")
+
+
+def prepare(work_path, n_rows, missing_rate):
+    from synthetic_data import make_pipeline_data
+
+    preprocess_module = load_stage("1-preprocess-dataset-train.py")
+    df_data, x_cols = make_pipeline_data(n_rows, preprocess_module.X_COLS, missing_rate=missing_rate, text_cols=TEXT_COLS)
+    # One dataset name per format, as saving a dataset removes its other formats
+    for data_format in FORMATS:
+        DatasetIO(data_format).save_dataset(df_data, f"{work_path}/application_data_{data_format}")
+    dataset_schema = DatasetSchema.infer(DatasetIO("npy").iterate_dataset_chunks(f"{work_path}/application_data_npy", 100000))
+    dataset_schema.save(f"{work_path}/dataset_schema.json")
+    with open(f"{work_path}/x_cols.json", "w") as handle:
+        json.dump(x_cols, handle)
+    print(json.dumps({"n_cols": len(df_data.columns),
+                      "dtypes": pd.Series([column["dtype"] for column in dataset_schema.get_columns()]).value_counts().to_dict()}))
+
+
+def worker(work_path, data_format, step, use_schema):
+    # Each measurement runs in a fresh interpreter, so the peak RSS is that of one load and nothing before it
+    preprocess_module = load_stage("1-preprocess-dataset-train.py")
+    dataset_io = DatasetIO(data_format)
+    dataset_schema = DatasetSchema.load(f"{work_path}/dataset_schema.json") if use_schema else None
+    with open(f"{work_path}/x_cols.json") as handle:
+        x_cols = json.load(handle)
+    columns = None if step == "load" else x_cols + ["TARGET"]
+    peak_rss_start = peak_rss_mb()
+    start = time.perf_counter()
+    df_data = dataset_io.load_dataset(f"{work_path}/application_data_{data_format}", columns=columns, dataset_schema=dataset_schema)
+    frame_mb = df_data.memory_usage(deep=True).sum() / 1024 ** 2
+    if step == "preprocess":
+        preprocess_module.PreprocessData(f"{work_path}/preprocess_{data_format}_{use_schema}").preprocess_dataset(df_data, x_cols, "TARGET")
+    print(json.dumps({"seconds": time.perf_counter() - start, "frame_mb": frame_mb,
+                      "peak_rss_mb": peak_rss_mb(), "peak_rss_increase_mb": peak_rss_mb() - peak_rss_start}))
+
+
+def run_benchmark(n_rows=200000, missing_rate=0.1, formats=FORMATS, steps=STEPS):
+    results = []
+    with tempfile.TemporaryDirectory() as work_path:
+        summary = run_command(os.path.abspath(__file__), "prepare", work_path, n_rows, missing_rate)
+        for step in steps:
+            for data_format in formats:
+                for use_schema in (False, True):
+                    result = run_command(os.path.abspath(__file__), "worker", work_path, data_format, step, use_schema)
+                    results.append({"step": step, "data_format": data_format, "schema": use_schema, **result})
+    df_results = pd.DataFrame(results)
+    print(json.dumps(summary))
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows=200000, missing_rate=0.1, formats=FORMATS, steps=STEPS):
+    run_benchmark(n_rows, missing_rate, list(formats), list(steps))
+
+if __name__ == "__main__":
+    fire.Fire({"run": main, "prepare": prepare, "worker": worker})
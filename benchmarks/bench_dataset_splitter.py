@@ -0,0 +1,82 @@
+import json
+import os
+import resource
+import tempfile
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+
+import stage_loader  # noqa: F401
+from process_utils import peak_rss_mb, run_command
+from dataset_io import DatasetIO
+from dataset_splitter import DatasetSplitter
+
+
+def prepare(input_path, n_rows, n_cols, chunk_size=100000):
+    # Written chunk by chunk so the input file can be made larger than the memory the splits are allowed
+    from synthetic_data import make_application_data
+
+    for start in range(0, n_rows, chunk_size):
+        df_chunk, _x_cols = make_application_data(min(chunk_size, n_rows - start), n_cols, seed=start)
+        df_chunk.insert(0, "SK_ID_CURR", np.arange(start, start + len(df_chunk)) + 100000)
+        df_chunk.to_csv(input_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    print(json.dumps({"input_mb": os.path.getsize(input_path) / 1024 ** 2}))
+
+
+def _legacy_split_data(df_data, perc_data_train):
+    df_data_train = df_data.sample(frac=perc_data_train)
+    df_data_test = df_data.drop(df_data_train.index)
+    return df_data_train, df_data_test
+
+
+def split(input_path, output_path, method, chunk_size=100000, memory_limit_mb=0):
+    if memory_limit_mb:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_mb * 1024 ** 2, memory_limit_mb * 1024 ** 2))
+    dataset_io = DatasetIO()
+    start = time.perf_counter()
+    try:
+        if method == "legacy":
+            df_data_train, df_data_test = _legacy_split_data(dataset_io.load_dataset(input_path), 0.7)
+            dataset_io.save_dataset(df_data_train, f"{output_path}/train_legacy")
+            dataset_io.save_dataset(df_data_test, f"{output_path}/test_legacy")
+            n_rows_train, n_rows_test = len(df_data_train), len(df_data_test)
+            target_rate_train, target_rate_test = df_data_train["TARGET"].mean(), df_data_test["TARGET"].mean()
+        else:
+            dataset_splitter = DatasetSplitter("SK_ID_CURR", 0.7, stratify_col="TARGET" if method == "stratified" else None)
+            n_rows_train, n_rows_test = dataset_splitter.split_dataset(dataset_io, input_path, f"{output_path}/train_{method}",
+                                                                       f"{output_path}/test_{method}", chunk_size)
+            target_rate_train = dataset_io.load_dataset(f"{output_path}/train_{method}", columns=["TARGET"])["TARGET"].mean()
+            target_rate_test = dataset_io.load_dataset(f"{output_path}/test_{method}", columns=["TARGET"])["TARGET"].mean()
+    except MemoryError:
+        print(json.dumps({"method": method, "status": "MemoryError", "peak_rss_mb": peak_rss_mb()}))
+        return
+    seconds = time.perf_counter() - start
+    print(json.dumps({"method": method, "status": "ok", "chunk_size": chunk_size if method != "legacy" else None,
+                      "seconds": seconds, "rows_per_second": (n_rows_train + n_rows_test) / seconds,
+                      "peak_rss_mb": peak_rss_mb(), "n_rows_train": n_rows_train, "n_rows_test": n_rows_test,
+                      "target_rate_train": target_rate_train, "target_rate_test": target_rate_test}))
+
+
+def run_benchmark(n_rows=1000000, n_cols=120, chunk_size=100000, memory_limit_mb=1024, methods=("legacy", "hash", "stratified")):
+    results = []
+    with tempfile.TemporaryDirectory() as work_path:
+        # Each run is a fresh interpreter under an address-space limit smaller than the input file, which stands
+        # in for a file larger than RAM without having to fill the machine
+        input_path = os.path.join(work_path, "application_data.csv")
+        input_mb = run_command(os.path.abspath(__file__), "prepare", input_path, n_rows, n_cols)["input_mb"]
+        for method in methods:
+            result = run_command(os.path.abspath(__file__), "split", input_path, work_path, method,
+                                 f"--chunk_size={chunk_size}", f"--memory_limit_mb={memory_limit_mb}")
+            results.append(dict(result, input_mb=input_mb, memory_limit_mb=memory_limit_mb))
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows=1000000, n_cols=120, chunk_size=100000, memory_limit_mb=1024, methods=("legacy", "hash", "stratified")):
+    run_benchmark(n_rows, n_cols, chunk_size, memory_limit_mb, list(methods))
+
+if __name__ == "__main__":
+    fire.Fire({"run": main, "prepare": prepare, "split": split})
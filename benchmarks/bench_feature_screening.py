@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+import sklearn.metrics as metrics
+
+from stage_loader import load_stage
+from synthetic_data import make_application_data
+
+
+def _legacy_screen_features(df_data, x_cols, y_col):
+    df_descriptive_statistics_x = df_data[x_cols].describe().transpose()
+    df_data_imputed = df_data.copy()
+    df_impute_parameters = pd.DataFrame()
+    for col in x_cols:
+        col_mean = df_data[col].mean()
+        df_data_imputed[col] = df_data[col].fillna(col_mean)
+        df_impute_parameters = pd.concat([df_impute_parameters, pd.DataFrame({"variable": [col], "impute_value": [col_mean]})])
+    pd_bivariate_analysis = pd.DataFrame()
+    for col in x_cols:
+        auc_col = metrics.roc_auc_score(df_data_imputed[y_col], df_data_imputed[col])
+        if (auc_col < 0.5): auc_col = (1 - auc_col)
+        pd_bivariate_analysis = pd.concat([pd_bivariate_analysis, pd.DataFrame({"variable": [col], "bivariate_auc": [auc_col]})])
+    return df_descriptive_statistics_x, df_impute_parameters, pd_bivariate_analysis
+
+
+def _time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(n_rows=50000, n_cols_list=(100, 300, 1000), repeats=3):
+    preprocess_module = load_stage("1-preprocess-dataset-train.py")
+    results = []
+    with tempfile.TemporaryDirectory() as output_path:
+        preprocess_data_instance = preprocess_module.PreprocessData(output_path)
+        for n_cols in n_cols_list:
+            df_data, x_cols = make_application_data(n_rows, n_cols)
+            legacy_times, engine_times = [], []
+            for _ in range(repeats):
+                legacy_time, legacy_result = _time_call(_legacy_screen_features, df_data, x_cols, "TARGET")
+                engine_time, _engine_result = _time_call(preprocess_data_instance.preprocess_screen_features, df_data, x_cols, "TARGET")
+                legacy_times.append(legacy_time)
+                engine_times.append(engine_time)
+
+            df_bivariate_analysis = pd.read_csv(os.path.join(output_path, "bivariate_analysis.csv"))
+            max_auc_diff = np.abs(df_bivariate_analysis["bivariate_auc"].values - legacy_result[2]["bivariate_auc"].values).max()
+            results.append({"n_rows": n_rows, "n_cols": n_cols,
+                            "legacy_seconds": min(legacy_times), "engine_seconds": min(engine_times),
+                            "speedup": min(legacy_times) / min(engine_times), "max_auc_diff": max_auc_diff})
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows=50000, n_cols_list=(100, 300, 1000), repeats=3):
+    run_benchmark(n_rows, list(n_cols_list), repeats)
+
+if __name__ == "__main__":
+    fire.Fire(main)
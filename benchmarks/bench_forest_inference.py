@@ -0,0 +1,58 @@
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+import stage_loader  # noqa: F401
+from forest_inference import PackedForest
+from synthetic_data import make_application_data
+
+
+def _time_call(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _single_row_latency_ms(predict_proba, df_rows):
+    latencies = [_time_call(predict_proba, df_rows.iloc[[row_index]])[0] for row_index in range(len(df_rows))]
+    return 1000 * np.percentile(latencies, 50), 1000 * np.percentile(latencies, 99)
+
+
+def run_benchmark(n_rows_train=50000, n_rows_score=1000000, n_cols=100, n_estimators_list=(50, 100),
+                  max_depth_list=(4, 6, 8), n_latency_rows=200):
+    df_train, x_cols = make_application_data(n_rows_train, n_cols)
+    df_train[x_cols] = df_train[x_cols].fillna(0)
+    # Scoring rows come as the float32 matrix the preprocess transform produces
+    df_score = pd.DataFrame(np.random.default_rng(1).normal(size=(n_rows_score, n_cols)).astype(np.float32), columns=x_cols)
+    results = []
+    for n_estimators in n_estimators_list:
+        for max_depth in max_depth_list:
+            model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, min_samples_leaf=100,
+                                           random_state=0, n_jobs=1)
+            model.fit(df_train[x_cols], df_train["TARGET"])
+            pack_seconds, packed_model = _time_call(PackedForest.from_forest, model)
+            sklearn_seconds, y_pred_sklearn = _time_call(model.predict_proba, df_score)
+            packed_seconds, y_pred_packed = _time_call(packed_model.predict_proba, df_score)
+            sklearn_p50_ms, sklearn_p99_ms = _single_row_latency_ms(model.predict_proba, df_score.iloc[:n_latency_rows])
+            packed_p50_ms, packed_p99_ms = _single_row_latency_ms(packed_model.predict_proba, df_score.iloc[:n_latency_rows])
+            results.append({"n_estimators": n_estimators, "max_depth": max_depth, "pack_seconds": pack_seconds,
+                            "sklearn_rows_per_second": n_rows_score / sklearn_seconds,
+                            "packed_rows_per_second": n_rows_score / packed_seconds,
+                            "throughput_speedup": sklearn_seconds / packed_seconds,
+                            "sklearn_single_row_p50_ms": sklearn_p50_ms, "sklearn_single_row_p99_ms": sklearn_p99_ms,
+                            "packed_single_row_p50_ms": packed_p50_ms, "packed_single_row_p99_ms": packed_p99_ms,
+                            "max_abs_diff": np.abs(y_pred_sklearn - y_pred_packed).max()})
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows_train=50000, n_rows_score=1000000, n_cols=100, n_estimators_list=(50, 100), max_depth_list=(4, 6, 8),
+         n_latency_rows=200):
+    run_benchmark(n_rows_train, n_rows_score, n_cols, n_estimators_list, max_depth_list, n_latency_rows)
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,129 @@
+import glob
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+
+import stage_loader  # noqa: F401
+from process_utils import run_command
+from model_store import ModelArtifact
+
+METHODS = ("pickle", "joblib", "packed_mmap")
+
+
+def prepare(work_path, n_rows, n_cols, n_estimators, max_depth):
+    from sklearn.ensemble import RandomForestClassifier
+    from preprocess_transform import PreprocessTransform
+    from synthetic_data import make_application_data
+
+    df_data, x_cols = make_application_data(n_rows, n_cols)
+    impute_values = df_data[x_cols].mean()
+    best_model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, min_samples_leaf=1, random_state=0)
+    best_model.fit(df_data[x_cols].fillna(impute_values), df_data["TARGET"])
+    # The pickle is what the select stage wrote before the model artifact existed
+    with open(f"{work_path}/best_model.pickle", "wb") as handle:
+        pickle.dump(best_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    preprocess_transform = PreprocessTransform(x_cols, impute_values.values, {col: str(df_data[col].dtype) for col in x_cols})
+    ModelArtifact.save(f"{work_path}/best_model", best_model, preprocess_transform)
+    df_data[x_cols].head(10000).to_csv(f"{work_path}/score_input.csv", index=False)
+    print(json.dumps({"pickle_mb": os.path.getsize(f"{work_path}/best_model.pickle") / 1024 ** 2,
+                      "artifact_mb": sum(os.path.getsize(path) for path in glob.glob(f"{work_path}/best_model/*")) / 1024 ** 2}))
+
+
+def _read_memory_mb():
+    # Pss splits every shared page between the processes mapping it, so summed over the workers it is the real total
+    fields = {}
+    with open("/proc/self/smaps_rollup") as handle:
+        for line in handle:
+            name, _sep, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0]) / 1024
+    return {"rss_mb": fields["Rss"], "pss_mb": fields["Pss"],
+            "private_mb": fields["Private_Clean"] + fields["Private_Dirty"],
+            "shared_mb": fields["Shared_Clean"] + fields["Shared_Dirty"]}
+
+
+def _load_model(work_path, method):
+    if method == "pickle":
+        with open(f"{work_path}/best_model.pickle", "rb") as handle:
+            return pickle.load(handle)
+    model_artifact = ModelArtifact.load(f"{work_path}/best_model")
+    if method == "joblib":
+        return model_artifact.load_estimator()
+    return model_artifact.load_packed_forest()
+
+
+def worker(work_path, method, worker_index, n_workers):
+    # sklearn is imported up front so the load time is the deserialization alone, not the import the pickle triggers
+    import sklearn.ensemble  # noqa: F401
+
+    df_score = pd.read_csv(f"{work_path}/score_input.csv").fillna(0).astype(np.float32)
+    memory_start = _read_memory_mb()
+    start = time.perf_counter()
+    model = _load_model(work_path, method)
+    load_seconds = time.perf_counter() - start
+    memory_loaded = _read_memory_mb()
+    model.predict_proba(df_score)
+
+    # Memory is read once every worker holds its model, so pages shared between them show up as shared
+    open(f"{work_path}/ready_{method}_{worker_index}", "w").close()
+    while len(glob.glob(f"{work_path}/ready_{method}_*")) < n_workers:
+        time.sleep(0.01)
+    memory_scored = _read_memory_mb()
+    open(f"{work_path}/done_{method}_{worker_index}", "w").close()
+    while len(glob.glob(f"{work_path}/done_{method}_*")) < n_workers:
+        time.sleep(0.01)
+    print(json.dumps({"method": method, "worker": worker_index, "load_seconds": load_seconds,
+                      "load_rss_mb": memory_loaded["rss_mb"] - memory_start["rss_mb"],
+                      "model_rss_mb": memory_scored["rss_mb"] - memory_start["rss_mb"],
+                      "model_pss_mb": memory_scored["pss_mb"] - memory_start["pss_mb"],
+                      "model_private_mb": memory_scored["private_mb"] - memory_start["private_mb"],
+                      "shared_mb": memory_scored["shared_mb"]}))
+
+
+def _run_workers(work_path, method, n_workers):
+    command = [sys.executable, os.path.abspath(__file__), "worker", work_path, method]
+    processes = [subprocess.Popen(command + [str(worker_index), str(n_workers)], stdout=subprocess.PIPE, text=True)
+                 for worker_index in range(n_workers)]
+    results = []
+    for process in processes:
+        output, _error = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Worker for '{method}' exited with code {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def run_benchmark(n_rows=50000, n_cols=100, n_estimators=300, max_depth=12, n_workers=4, methods=METHODS):
+    results = []
+    with tempfile.TemporaryDirectory() as work_path:
+        # Every worker is a fresh interpreter that loads the model on its own, like the chunked scoring workers.
+        # The files were just written, so the page cache is warm for every method.
+        sizes = run_command(os.path.abspath(__file__), "prepare", work_path, n_rows, n_cols, n_estimators, max_depth)
+        for method in methods:
+            df_workers = pd.DataFrame(_run_workers(work_path, method, n_workers))
+            results.append({"method": method, "n_workers": n_workers,
+                            "load_seconds_median": df_workers["load_seconds"].median(),
+                            "load_rss_mb_per_worker": df_workers["load_rss_mb"].median(),
+                            "model_rss_mb_per_worker": df_workers["model_rss_mb"].median(),
+                            "model_pss_mb_per_worker": df_workers["model_pss_mb"].median(),
+                            "model_private_mb_per_worker": df_workers["model_private_mb"].median(),
+                            "model_pss_mb_total": df_workers["model_pss_mb"].sum()})
+    df_results = pd.DataFrame(results)
+    print(json.dumps(sizes))
+    print(df_results.to_string(index=False))
+    return df_results
+
+
+def main(n_rows=50000, n_cols=100, n_estimators=300, max_depth=12, n_workers=4, methods=METHODS):
+    run_benchmark(n_rows, n_cols, n_estimators, max_depth, n_workers, list(methods))
+
+if __name__ == "__main__":
+    fire.Fire({"run": main, "prepare": prepare, "worker": worker})
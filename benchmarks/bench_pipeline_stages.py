@@ -0,0 +1,165 @@
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+import sklearn
+
+from stage_loader import SRC_PATH, load_stage
+from synthetic_data import make_pipeline_data
+from dataset_io import DatasetIO
+from dataset_splitter import DatasetSplitter
+from instrumentation import StageMetrics
+
+# Stage name -> the instrumented method whose span is timed
+STAGE_METHODS = {"split": "split_dataset", "preprocess": "preprocess_dataset", "prepare_test": "prepare_dataset",
+                 "train": "train_evaluate_models", "select": "select_best_model", "score": "score_preprocess_model"}
+BENCHMARK_SPAN = "benchmark"
+
+
+def _run_stages(work_path, n_rows, n_cols, missing_rate, positive_rate, stages, repeats, search_strategy, n_jobs):
+    # Every stage runs on the outputs of the one before it, like the pipeline, so all of them run once per scale
+    # even when only some are reported. Only the timed call of each stage is repeated.
+    split_module = load_stage("0-split-dataset.py")
+    preprocess_module = load_stage("1-preprocess-dataset-train.py")
+    prepare_module = load_stage("2-prepare-dataset-test.py")
+    train_module = load_stage("3-train-evaluate-models.py")
+    select_module = load_stage("4-select-best-model.py")
+    score_module = load_stage("5-score-model.py")
+
+    def repeat(stage, function):
+        for _ in range(repeats if stage in stages else 1):
+            result = function()
+        return result
+
+    dataset_io = DatasetIO()
+    output_path_preprocess = os.path.join(work_path, "preprocess")
+    output_path_train = os.path.join(work_path, "train")
+    df_data, x_cols = make_pipeline_data(n_rows, preprocess_module.X_COLS, n_cols, missing_rate, positive_rate)
+    dataset_io.save_dataset(df_data, f"{work_path}/application_data")
+    del df_data
+
+    dataset_splitter = DatasetSplitter(**split_module.SPLIT_PARAMETERS)
+    repeat("split", lambda: dataset_splitter.split_dataset(dataset_io, f"{work_path}/application_data", f"{work_path}/application_data_train",
+                                                           f"{work_path}/application_data_test", split_module.CHUNK_SIZE))
+
+    df_data_train = dataset_io.load_dataset(f"{work_path}/application_data_train", columns=x_cols + ["TARGET"])
+    preprocess_data_instance = preprocess_module.PreprocessData(output_path_preprocess)
+    df_data_train_prepared = repeat("preprocess", lambda: preprocess_data_instance.preprocess_dataset(df_data_train, x_cols, "TARGET"))
+    del df_data_train
+
+    prepare_data_instance = prepare_module.PrepareData(output_path_preprocess)
+    df_data_test = dataset_io.load_dataset(f"{work_path}/application_data_test", columns=prepare_data_instance.get_required_columns())
+    df_data_test_prepared = repeat("prepare_test", lambda: prepare_data_instance.prepare_dataset(df_data_test))
+    del df_data_test
+
+    train_evaluate_models_instance = train_module.TrainEvaluateModels(output_path_train, output_path_preprocess)
+    repeat("train", lambda: train_evaluate_models_instance.train_evaluate_models(df_data_train_prepared, train_module.MODEL_PARAMETERS_GRID,
+                                                                                 search_strategy, n_jobs))
+
+    select_best_model_instance = select_module.SelectBestModel(output_path_train)
+    repeat("select", lambda: select_best_model_instance.select_best_model(df_data_train_prepared, df_data_test_prepared))
+
+    # A new ScoreModel per call, so artifact loading is part of every timing as it is in the batch stage
+    df_data_score = df_data_test_prepared[score_module.ScoreModel(output_path_train).get_required_columns()]
+    repeat("score", lambda: score_module.ScoreModel(output_path_train).score_preprocess_model(df_data_score.copy()))
+    return len(x_cols)
+
+
+def _read_stage_spans(metrics_path, stages):
+    method_stages = {method: stage for stage, method in STAGE_METHODS.items() if stage in stages}
+    spans = {}
+    with open(metrics_path) as handle:
+        for line in handle:
+            event = json.loads(line)
+            if (event.get("parent") == BENCHMARK_SPAN) and (event.get("span") in method_stages):
+                spans.setdefault(method_stages[event["span"]], []).append(event)
+    return spans
+
+
+def run_scale(work_path, n_rows, n_cols=None, missing_rate=0.1, positive_rate=0.08, stages=tuple(STAGE_METHODS), repeats=3,
+              search_strategy="grid", n_jobs=-1):
+    # The stage spans written by the instrumentation carry both the time and the peak RSS of each call
+    with StageMetrics(BENCHMARK_SPAN, output_path=work_path) as stage_metrics:
+        n_cols = _run_stages(work_path, n_rows, n_cols, missing_rate, positive_rate, stages, repeats, search_strategy, n_jobs)
+    results = []
+    for stage, events in _read_stage_spans(stage_metrics.get_metrics_path(), stages).items():
+        fastest = min(events, key=lambda event: event["seconds"])
+        results.append({"stage": stage, "n_rows": n_rows, "n_cols": n_cols, "missing_rate": missing_rate, "positive_rate": positive_rate,
+                        "seconds": fastest["seconds"], "seconds_median": float(np.median([event["seconds"] for event in events])),
+                        "rows_per_second": n_rows / fastest["seconds"],
+                        "peak_rss_mb": max(event["peak_rss_mb"] for event in events),
+                        "peak_rss_increase_mb": max(event["peak_rss_mb"] - event["rss_start_mb"] for event in events)})
+    return results
+
+
+def _get_environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "dataset_format": DatasetIO().get_data_format()}
+
+
+def compare_results(results, baseline_results, regression_threshold=0.2, min_seconds=0.05):
+    # A stage regresses when it is more than regression_threshold slower than the baseline at the same scale.
+    # Timings under min_seconds in both runs are too noisy to flag.
+    key_cols = ["stage", "n_rows", "n_cols", "missing_rate", "positive_rate"]
+    df_comparison = pd.DataFrame(results)[key_cols + ["seconds"]].merge(
+        pd.DataFrame(baseline_results)[key_cols + ["seconds"]], on=key_cols, suffixes=("", "_baseline"))
+    df_comparison["ratio"] = df_comparison["seconds"] / df_comparison["seconds_baseline"]
+    df_comparison["regression"] = ((df_comparison["ratio"] > 1 + regression_threshold)
+                                   & (df_comparison[["seconds", "seconds_baseline"]].max(axis=1) >= min_seconds))
+    return df_comparison
+
+
+def _load_results(results_file):
+    with open(results_file) as handle:
+        return json.load(handle)
+
+
+def compare(results_file, baseline_file, regression_threshold=0.2, min_seconds=0.05):
+    results, baseline = _load_results(results_file), _load_results(baseline_file)
+    if results["environment"] != baseline["environment"]:
+        print(f"Environments differ, timings may not be comparable: {results['environment']} vs {baseline['environment']}")
+    df_comparison = compare_results(results["results"], baseline["results"], regression_threshold, min_seconds)
+    print(df_comparison.to_string(index=False))
+    if df_comparison["regression"].any():
+        sys.exit(f"{int(df_comparison['regression'].sum())} stage timings regressed by more than {regression_threshold:.0%}")
+
+
+def run_benchmark(n_rows_list=(10000, 50000, 100000), n_cols_list=(None,), missing_rate=0.1, positive_rate=0.08,
+                  stages=tuple(STAGE_METHODS), repeats=3, search_strategy="grid", n_jobs=-1):
+    unknown_stages = set(stages) - set(STAGE_METHODS)
+    if unknown_stages:
+        raise ValueError(f"Unknown stages {sorted(unknown_stages)}, expected some of: {', '.join(STAGE_METHODS)}")
+    results = []
+    for n_cols in n_cols_list:
+        for n_rows in n_rows_list:
+            with tempfile.TemporaryDirectory() as work_path:
+                results += run_scale(work_path, n_rows, n_cols, missing_rate, positive_rate, stages, repeats, search_strategy, n_jobs)
+    df_results = pd.DataFrame(results)
+    print(df_results.to_string(index=False))
+    return results
+
+
+def main(n_rows_list=(10000, 50000, 100000), n_cols_list=(None,), missing_rate=0.1, positive_rate=0.08,
+         stages=tuple(STAGE_METHODS), repeats=3, search_strategy="grid", n_jobs=-1,
+         output_file=None, baseline_file=None, regression_threshold=0.2, min_seconds=0.05):
+    # n_cols=None uses the X_COLS of the preprocess stage; larger values add synthetic columns after them
+    results = run_benchmark(list(n_rows_list), list(n_cols_list), missing_rate, positive_rate, list(stages), repeats, search_strategy, n_jobs)
+    if output_file is None:
+        output_file = os.path.join(os.path.dirname(SRC_PATH), "outputs", "benchmarks", f"pipeline_stages_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, "w") as handle:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": _get_environment(),
+                   "parameters": {"repeats": repeats, "search_strategy": search_strategy, "n_jobs": n_jobs}, "results": results},
+                  handle, indent=1)
+    print(f"Results saved to {output_file}")
+    if baseline_file is not None:
+        compare(output_file, baseline_file, regression_threshold, min_seconds)
+
+if __name__ == "__main__":
+    fire.Fire({"run": main, "compare": compare})
@@ -0,0 +1,19 @@
+import json
+import resource
+import subprocess
+import sys
+
+
+def run_command(script_path, *args):
+    # Runs a step of a benchmark script in a fresh interpreter and returns the JSON printed on its last line
+    command = [sys.executable, script_path] + [str(arg) for arg in args]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def peak_rss_mb(include_children=False):
+    # ru_maxrss is in kB on Linux; the children's peak is that of the largest worker process, not their sum
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak_rss = max(peak_rss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak_rss / 1024
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+
+def make_application_data(n_rows, n_cols, missing_rate=0.1, positive_rate=0.08, correlated_rate=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n_rows) < positive_rate).astype(np.int64)
+    latent = rng.normal(size=(n_rows, 1)) + y[:, np.newaxis] * 0.3
+    x_matrix = 0.5 * latent + rng.normal(size=(n_rows, n_cols))
+    correlated_cols = np.flatnonzero(rng.random(n_cols) < correlated_rate)
+    correlated_cols = correlated_cols[correlated_cols > 0]
+    source_cols = rng.integers(0, correlated_cols, size=len(correlated_cols)) if len(correlated_cols) else correlated_cols
+    x_matrix[:, correlated_cols] = x_matrix[:, source_cols] + 0.4 * rng.normal(size=(n_rows, len(correlated_cols)))
+    x_matrix[:, ::4] = np.round(x_matrix[:, ::4])
+    x_matrix[rng.random((n_rows, n_cols)) < missing_rate] = np.nan
+    x_cols = [f"X_{i:04d}" for i in range(n_cols)]
+    df_data = pd.DataFrame(x_matrix, columns=x_cols)
+    df_data["TARGET"] = y
+    return df_data, x_cols
+
+
+_BUILDING_SUFFIXES = ("_AVG", "_MODE", "_MEDI")
+# Columns that are complete in the application data; missing_rate applies to every other column
+_COMPLETE_PREFIXES = ("FLAG_", "REG_", "LIVE_", "REGION_", "HOUR_")
+_COMPLETE_COLS = {"CNT_CHILDREN", "AMT_INCOME_TOTAL", "AMT_CREDIT", "DAYS_BIRTH", "DAYS_EMPLOYED", "DAYS_REGISTRATION", "DAYS_ID_PUBLISH"}
+
+
+def _get_column_base(col):
+    # The _AVG, _MODE and _MEDI statistics of one building attribute share their base value, as in the real data
+    for suffix in _BUILDING_SUFFIXES:
+        if col.endswith(suffix) and col != "TOTALAREA_MODE":
+            return col[:-len(suffix)]
+    return col
+
+
+def _make_application_column(col, z, rng):
+    n_rows = len(z)
+    if col.startswith(("FLAG_", "REG_", "LIVE_")):
+        return (rng.random(n_rows) < 1 / (1 + np.exp(-(z - 1)))).astype(np.int64)
+    if col.startswith("DAYS_"):
+        return -np.round(np.abs(z) * 3000).astype(np.int64)
+    if col.startswith("AMT_REQ_"):
+        return rng.poisson(np.exp(0.3 * z - 1)).astype(np.int64)
+    if col.startswith("AMT_"):
+        return np.round(np.exp(12 + 0.5 * z), 1)
+    if col.startswith(("CNT_", "OBS_", "DEF_", "HOUR_", "REGION_RATING_")) or col == "OWN_CAR_AGE":
+        return np.clip(np.round(2 + z), 0, None).astype(np.int64)
+    if col.startswith("EXT_SOURCE_") or col.endswith(_BUILDING_SUFFIXES) or col == "REGION_POPULATION_RELATIVE":
+        return 1 / (1 + np.exp(-z))
+    return z
+
+
+def make_pipeline_data(n_rows, x_cols, n_cols=None, missing_rate=0.1, positive_rate=0.08, text_cols=(), seed=0):
+    # Columns keep the given names (the first n_cols of them) and extra X_#### columns fill in beyond that.
+    # Each of text_cols holds up to 10 labels like <col>_03, missing at missing_rate.
+    rng = np.random.default_rng(seed)
+    n_cols = len(x_cols) if n_cols is None else n_cols
+    x_cols = list(x_cols[:n_cols]) + [f"X_{i:04d}" for i in range(n_cols - len(x_cols))]
+    y = (rng.random(n_rows) < positive_rate).astype(np.int64)
+    latent = rng.normal(size=n_rows) + y * 0.3
+    base_values = {}
+    data = {"SK_ID_CURR": np.arange(n_rows, dtype=np.int64) + 100002}
+    for col in x_cols:
+        base = _get_column_base(col)
+        if base not in base_values:
+            base_values[base] = rng.uniform(-0.5, 0.5) * latent + rng.normal(size=n_rows)
+        values = _make_application_column(col, base_values[base] + 0.2 * rng.normal(size=n_rows), rng)
+        is_missing = rng.random(n_rows) < missing_rate
+        if is_missing.any() and not (col.startswith(_COMPLETE_PREFIXES) or col in _COMPLETE_COLS):
+            values = values.astype(np.float64)
+            values[is_missing] = np.nan
+        data[col] = values
+    for col in text_cols:
+        labels = np.array([f"{col}_{i:02d}" for i in range(rng.integers(2, 11))] + [None], dtype=object)
+        codes = np.minimum(np.abs(latent * rng.uniform(-2, 2) + rng.normal(size=n_rows)) * 2, len(labels) - 2).astype(np.int64)
+        codes[rng.random(n_rows) < missing_rate] = len(labels) - 1
+        data[col] = labels[codes]
+    data["TARGET"] = y
+    return pd.DataFrame(data), x_cols
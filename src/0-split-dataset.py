@@ -1,26 +1,37 @@
-import pandas as pd
-import fire
-import os
-
-
-def split_data(df_data, perc_data_train):
-    df_data_train = df_data.sample(frac=perc_data_train)
-    df_data_test = df_data.drop(df_data_train.index)
-    return df_data_train, df_data_test
-
-def process_split_data():
-    if (os.getcwd().endswith('src')):
-        os.chdir("..")
-    df_data = pd.read_csv("data/in/application_data.csv")
-    df_data_train, df_data_test = split_data(df_data, 0.7)
-
-    if (not (os.path.exists("data/out"))):
-        os.mkdir("data/out")
-    df_data_train.to_csv("data/out/application_data_train.csv", index=False)
-    df_data_test.to_csv("data/out/application_data_test.csv", index=False)
-
-def main():
-    process_split_data()
-
-if __name__ == "__main__":
-    fire.Fire(main)
+import fire
+import os
+from dataset_io import DatasetIO
+from dataset_splitter import DatasetSplitter
+from instrumentation import StageMetrics
+import instrumentation
+
+
+def split_data(dataset_io, dataset_splitter, input_dataset_path, output_path_train, output_path_test, chunk_size):
+    n_rows_train, n_rows_test = dataset_splitter.split_dataset(dataset_io, input_dataset_path, output_path_train, output_path_test, chunk_size)
+    instrumentation.record("split_rows", n_rows_train=n_rows_train, n_rows_test=n_rows_test)
+    return n_rows_train, n_rows_test
+
+def process_split_data(split_parameters, chunk_size):
+    if (os.getcwd().endswith('src')):
+        os.chdir("..")
+    dataset_io = DatasetIO()
+    dataset_splitter = DatasetSplitter(**split_parameters)
+
+    if (not (os.path.exists("data/out"))):
+        os.mkdir("data/out")
+    split_data(dataset_io, dataset_splitter, "data/in/application_data",
+               "data/out/application_data_train", "data/out/application_data_test", chunk_size)
+
+
+# Rows go to train by a seeded hash of the key; set time_col="CODMES" and test_start=<CODMES> for an out-of-time test set
+SPLIT_PARAMETERS = {"key_col": "SK_ID_CURR", "train_fraction": 0.7, "seed": 0, "stratify_col": "TARGET",
+                    "time_col": None, "test_start": None}
+CHUNK_SIZE = 100000
+
+
+def main(chunk_size=CHUNK_SIZE, profile=False):
+    with StageMetrics("split", profile=profile):
+        process_split_data(SPLIT_PARAMETERS, chunk_size)
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -1,45 +1,57 @@
-import fire
-import pandas as pd
-import os
-
-
-class PrepareData():
-    _output_path = ""
-
-    def __init__(self, output_path):
-        self._output_path = output_path
-
-    def _get_y_column(self):
-        y_col = pd.read_csv(f'{self._output_path}/y_col_name.csv')['y_col'].to_list()
-        return y_col
-
-    def prepare_impute_missing(self, df_data, x_cols):
-        df_data_imputed = df_data.copy()
-        df_impute_parameters = pd.read_csv(f"{self._output_path}/impute_missing_parameters.csv")
-        for col in x_cols:
-            impute_value = df_impute_parameters[df_impute_parameters["variable"]==col]["impute_value"].values[0]
-            df_data_imputed[col] = df_data_imputed[col].fillna(impute_value)
-        return df_data_imputed
-
-    def prepare_dataset(self, df_data):
-        y_col = self._get_y_column()
-        x_cols = pd.read_csv(f"{self._output_path}/final_variables.csv")["variable"].values.tolist()
-        df_data_prepared = df_data[x_cols + y_col]
-        df_data_prepared = self.prepare_impute_missing(df_data_prepared, x_cols)
-
-        return df_data_prepared
-
-def process_prepare_dataset():
-    if (os.getcwd().endswith('src')):
-        os.chdir("..")
-    df_data_test = pd.read_csv("data/out/application_data_test.csv")
-    prepare_data_instance = PrepareData("outputs/preprocess")
-    df_data_test_prepared = prepare_data_instance.prepare_dataset(df_data_test)
-    df_data_test_prepared.to_csv("data/out/application_data_test_prepared.csv", index=False)
-
-
-def main():
-    process_prepare_dataset()
-
-if __name__ == "__main__":
-    fire.Fire(main)
+import fire
+import pandas as pd
+import os
+from dataset_io import DatasetIO
+from dataset_schema import DatasetSchema
+from instrumentation import StageMetrics, instrumented
+from preprocess_transform import PreprocessTransform
+
+
+class PrepareData():
+    _output_path = ""
+
+    def __init__(self, output_path):
+        self._output_path = output_path
+
+    def _get_y_column(self):
+        y_col = pd.read_csv(f'{self._output_path}/y_col_name.csv')['y_col'].to_list()
+        return y_col
+
+    def _get_transform(self):
+        return PreprocessTransform.load(f"{self._output_path}/preprocess_transform.json")
+
+    def get_dataset_schema(self):
+        return DatasetSchema.load(f"{self._output_path}/dataset_schema.json")
+
+    def get_required_columns(self):
+        return self._get_transform().get_feature_names() + self._get_y_column()
+
+    def prepare_impute_missing(self, df_data, preprocess_transform):
+        df_data_imputed = preprocess_transform.transform_frame(df_data)
+        return df_data_imputed
+
+    @instrumented
+    def prepare_dataset(self, df_data):
+        y_col = self._get_y_column()
+        df_data_prepared = self.prepare_impute_missing(df_data, self._get_transform())
+        df_data_prepared[y_col] = df_data[y_col]
+
+        return df_data_prepared
+
+def process_prepare_dataset():
+    if (os.getcwd().endswith('src')):
+        os.chdir("..")
+    dataset_io = DatasetIO()
+    prepare_data_instance = PrepareData("outputs/preprocess")
+    df_data_test = dataset_io.load_dataset("data/out/application_data_test", columns=prepare_data_instance.get_required_columns(),
+                                           dataset_schema=prepare_data_instance.get_dataset_schema())
+    df_data_test_prepared = prepare_data_instance.prepare_dataset(df_data_test)
+    dataset_io.save_dataset(df_data_test_prepared, "data/out/application_data_test_prepared")
+
+
+def main(profile=False):
+    with StageMetrics("prepare_test", profile=profile):
+        process_prepare_dataset()
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -1,14 +1,22 @@
 import fire
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import GridSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV
+from joblib import parallel_config
 import os
-import pickle
+from dataset_io import DatasetIO
+from model_store import ModelArtifact
+from model_search import WarmStartForestSearch
+from instrumentation import StageMetrics, instrumented
+from preprocess_transform import PreprocessTransform
+import instrumentation
 
 
 class TrainEvaluateModels:
     _output_path_train = ""
     _output_path_preprocess = ""
+    _halving_factor = 3
 
     def _create_output_path_train(self):
         if not(os.path.exists(self._output_path_train)):
@@ -32,18 +40,49 @@ class TrainEvaluateModels:
         self._output_path_preprocess = output_path_preprocess
         self._create_output_path_train()
 
-    def train_evaluate_models(self, df_data_train, model_parameters_grid):
-        rf = RandomForestClassifier()
+    def _create_model_search(self, model_parameters_grid, search_strategy, n_jobs):
+        # The search owns the cores: forests stay single-threaded and BLAS/OpenMP pools inside workers get one thread
+        rf = RandomForestClassifier(n_jobs=1)
+        if search_strategy == "grid":
+            return GridSearchCV(estimator=rf, param_grid=model_parameters_grid, scoring='roc_auc', n_jobs=n_jobs)
+        if search_strategy == "halving":
+            return HalvingGridSearchCV(estimator=rf, param_grid=model_parameters_grid, scoring='roc_auc', factor=self._halving_factor,
+                                       resource='n_samples', n_jobs=n_jobs)
+        if search_strategy == "warm_start":
+            return WarmStartForestSearch(estimator=rf, param_grid=model_parameters_grid, scoring='roc_auc', n_jobs=n_jobs)
+        raise ValueError(f"Unknown search strategy '{search_strategy}', expected one of: grid, halving, warm_start")
+
+    def _build_model_results(self, grid_search):
+        cv_results = grid_search.cv_results_
+        n_splits = grid_search.n_splits_
+        df_model_results = pd.DataFrame({'model_parameters': cv_results['params'],
+                                         'model_rank': cv_results['rank_test_score'],
+                                         'auc_score_mean': cv_results['mean_test_score'],
+                                         'auc_score_std': cv_results['std_test_score']})
+        df_model_results['auc_score_cv'] = df_model_results['auc_score_std'] / df_model_results['auc_score_mean']
+        if 'iter' in cv_results:
+            # Successive halving only compares candidates within an iteration; the last iteration holds the best model
+            df_model_results['iter'] = cv_results['iter']
+            df_model_results['n_resources'] = cv_results['n_resources']
+            iter_counts = df_model_results['iter'].value_counts()
+            rank_offset = df_model_results['iter'].map(lambda iteration: iter_counts[iter_counts.index > iteration].sum())
+            rank_in_iter = df_model_results.groupby('iter')['auc_score_mean'].rank(method='min', ascending=False)
+            df_model_results['model_rank'] = (rank_offset + rank_in_iter).astype(int)
+        df_model_results['fit_time_seconds'] = cv_results['mean_fit_time'] * n_splits
+        df_model_results['score_time_seconds'] = cv_results['mean_score_time'] * n_splits
+        # Summed over the folds, which may have run in parallel, so this is the compute a candidate cost, not elapsed time
+        df_model_results['fit_score_seconds_total'] = df_model_results['fit_time_seconds'] + df_model_results['score_time_seconds']
+        return df_model_results
+
+    @instrumented
+    def train_evaluate_models(self, df_data_train, model_parameters_grid, search_strategy="grid", n_jobs=-1):
         x_cols = self._get_preprocess_x_columns()
         y_col = self._get_preprocess_y_column()
-        grid_search = GridSearchCV(estimator=rf, param_grid=model_parameters_grid, scoring='roc_auc')
-        grid_search.fit(df_data_train[x_cols], df_data_train[y_col].values.ravel())
+        grid_search = self._create_model_search(model_parameters_grid, search_strategy, n_jobs)
+        with instrumentation.span("fit"), parallel_config(backend="loky", inner_max_num_threads=1):
+            grid_search.fit(df_data_train[x_cols], df_data_train[y_col].values.ravel())
 
-        df_model_results = pd.DataFrame({'model_parameters': grid_search.cv_results_['params'],
-                                         'model_rank': grid_search.cv_results_['rank_test_score'],
-                                         'auc_score_mean': grid_search.cv_results_['mean_test_score'],
-                                         'auc_score_std': grid_search.cv_results_['std_test_score']})
-        df_model_results['auc_score_cv'] = df_model_results['auc_score_std'] / df_model_results['auc_score_mean']
+        df_model_results = self._build_model_results(grid_search)
         df_model_results.to_csv(f'{self._output_path_train}/metrics/train_cv_model_results.csv', index=False)
 
         df_model_results_best_model = df_model_results[df_model_results['model_rank']==1]
@@ -52,23 +91,31 @@ class TrainEvaluateModels:
         df_feature_importance = pd.DataFrame({'variable': grid_search.feature_names_in_, 'importance': grid_search.best_estimator_.feature_importances_})
         df_feature_importance.to_csv(f'{self._output_path_train}/feature_importance.csv', index=False)
 
-        with open(f'{self._output_path_train}/models/grid_search_model.pickle', 'wb') as handle:
-            pickle.dump(grid_search, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        # Only the refitted best estimator is kept, stored with the preprocessing it expects; the search results
+        # are already in the metrics files
+        preprocess_transform = PreprocessTransform.load(f'{self._output_path_preprocess}/preprocess_transform.json')
+        with instrumentation.span("save_model_artifact"):
+            ModelArtifact.save(f'{self._output_path_train}/models/best_model', grid_search.best_estimator_, preprocess_transform,
+                               metadata={'model_parameters': grid_search.best_params_, 'auc_score_mean': float(grid_search.best_score_),
+                                         'search_strategy': search_strategy})
 
 
-def process_train_evaluate_models(model_parameters_grid):
+def process_train_evaluate_models(model_parameters_grid, search_strategy="grid", n_jobs=-1):
     if (os.getcwd().endswith("src")):
         os.chdir("..")
-    df_data_train = pd.read_csv("data/out/application_data_train_prepared.csv")
+    df_data_train = DatasetIO().load_dataset("data/out/application_data_train_prepared")
     train_validate_models_instance = TrainEvaluateModels(output_path_train="outputs/train", output_path_preprocess="outputs/preprocess")
-    train_validate_models_instance.train_evaluate_models(df_data_train, model_parameters_grid)
+    train_validate_models_instance.train_evaluate_models(df_data_train, model_parameters_grid, search_strategy, n_jobs)
+
+
+#MODEL_PARAMETERS_GRID =  {'n_estimators':[50,100,500], 'max_depth':[2,4,6,8], 'min_samples_leaf':[50,100,250,500], 'min_impurity_decrease':[0, 0.001, 0.005]}
+MODEL_PARAMETERS_GRID = {'n_estimators': [50, 100], 'max_depth': [4, 6],
+                         'min_samples_leaf': [100], 'min_impurity_decrease': [0]}
 
 
-def main():
-    #model_parameters_grid =  {'n_estimators':[50,100,500], 'max_depth':[2,4,6,8], 'min_samples_leaf':[50,100,250,500], 'min_impurity_decrease':[0, 0.001, 0.005]}
-    model_parameters_grid = {'n_estimators': [50, 100], 'max_depth': [4, 6],
-                             'min_samples_leaf': [100], 'min_impurity_decrease': [0]}
-    process_train_evaluate_models(model_parameters_grid)
+def main(search_strategy="grid", n_jobs=-1, profile=False):
+    with StageMetrics("train", profile=profile):
+        process_train_evaluate_models(MODEL_PARAMETERS_GRID, search_strategy, n_jobs)
 
 if __name__ == "__main__":
     fire.Fire(main)
@@ -2,14 +2,24 @@ import fire
 import pandas as pd
 import sklearn.metrics as metrics
 import os
-import pickle
+from auc_evaluation import AucEvaluation
+from dataset_io import DatasetIO
+from instrumentation import StageMetrics, instrumented
+from model_store import ModelArtifact
+import instrumentation
 
 class SelectBestModel:
     _output_path_train = ""
     _best_model = None
+    _scores = None
+    _segment_cols = ["CODMES", "FLAG_LIMA_PROVINCIA", "RANG_INGRESO"]
+    _n_bootstrap = 1000
+    _confidence_level = 0.95
+    _random_state = 0
 
     def __init__(self, output_path_train):
         self._output_path_train = output_path_train
+        self._scores = {}
 
     def _get_features_name(self):
         df_feature_importance = pd.read_csv(f'{self._output_path_train}/feature_importance.csv')
@@ -19,38 +29,72 @@ class SelectBestModel:
         y_col = "TARGET"
         return y_col
 
-    def _evaluate_best_model_in_dataset(self, df_data):
-        x_cols = self._get_features_name()
+    @instrumented
+    def _predict_scores(self, sample, df_data):
+        # Each sample is scored once; the point AUC, the bootstrap and every segment reuse the cached scores
+        if sample not in self._scores:
+            x_cols = self._get_features_name()
+            self._scores[sample] = self._best_model.predict_proba(df_data[x_cols])[:, 1]
+        return self._scores[sample]
+
+    @instrumented
+    def _evaluate_best_model_in_dataset(self, sample, df_data):
         y_col = self._get_target_name()
-        y_pred = self._best_model.predict_proba(df_data[x_cols])
-        auc_metric = metrics.roc_auc_score(df_data[y_col], y_pred[:,1])
+        auc_metric = metrics.roc_auc_score(df_data[y_col], self._predict_scores(sample, df_data))
         return auc_metric
 
-    def select_best_model(self, df_data_train, df_data_test):
-        with open(f'{self._output_path_train}/models/grid_search_model.pickle', 'rb') as handle:
-            grid_search = pickle.load(handle)
+    @instrumented
+    def _evaluate_best_model_segments(self, samples, n_jobs):
+        y_col = self._get_target_name()
+        auc_evaluation = AucEvaluation(self._n_bootstrap, self._confidence_level, self._random_state, n_jobs)
+        df_segment_metrics = auc_evaluation.evaluate({sample: (df_data[y_col], self._predict_scores(sample, df_data), df_segments)
+                                                      for sample, (df_data, df_segments) in samples.items()})
+        df_segment_metrics.to_csv(f'{self._output_path_train}/metrics/train_test_segment_metrics.csv', index=False)
+        return df_segment_metrics
 
-        self._best_model = grid_search.best_estimator_
-        with open(f'{self._output_path_train}/models/best_model.pickle', 'wb') as handle:
-            pickle.dump(self._best_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    @instrumented
+    def select_best_model(self, df_data_train, df_data_test, df_segments_train=None, df_segments_test=None, n_jobs=1):
+        # The training stage stores the refitted best estimator; it is loaded here once to evaluate it
+        with instrumentation.span("load_model_artifact"):
+            model_artifact = ModelArtifact.load(f'{self._output_path_train}/models/best_model')
+            self._best_model = model_artifact.load_estimator()
+        self._scores = {}
 
-        auc_metric_train = self._evaluate_best_model_in_dataset(df_data_train)
-        auc_metric_test = self._evaluate_best_model_in_dataset(df_data_test)
+        auc_metric_train = self._evaluate_best_model_in_dataset('train', df_data_train)
+        auc_metric_test = self._evaluate_best_model_in_dataset('test', df_data_test)
 
         df_metrics = pd.DataFrame({'sample':['train','test'],'auc':[auc_metric_train, auc_metric_test]})
         df_metrics.to_csv(f'{self._output_path_train}/metrics/train_test_metrics.csv', index=False)
+        self._evaluate_best_model_segments({'train': (df_data_train, df_segments_train), 'test': (df_data_test, df_segments_test)}, n_jobs)
+
+    def get_segment_cols(self):
+        return self._segment_cols
+
+
+def _load_segments(dataset_io, dataset_path, segment_cols):
+    # The prepared datasets keep the rows of the split datasets in order, so segment columns the preprocessing
+    # dropped are read from the split dataset; segment columns it does not have are skipped
+    dataset_cols = dataset_io.load_dataset_columns(dataset_path)
+    segment_cols = [col for col in segment_cols if col in dataset_cols]
+    if not segment_cols:
+        return None
+    return dataset_io.load_dataset(dataset_path, columns=segment_cols)
 
 
-def process_select_best_model():
+def process_select_best_model(n_jobs=1):
     if (os.getcwd().endswith("src")):
         os.chdir("..")
-    df_data_train = pd.read_csv("data/out/application_data_train_prepared.csv")
-    df_data_test = pd.read_csv("data/out/application_data_test_prepared.csv")
+    dataset_io = DatasetIO()
+    df_data_train = dataset_io.load_dataset("data/out/application_data_train_prepared")
+    df_data_test = dataset_io.load_dataset("data/out/application_data_test_prepared")
     select_best_model_instance = SelectBestModel(output_path_train="outputs/train")
-    select_best_model_instance.select_best_model(df_data_train, df_data_test)
+    df_segments_train = _load_segments(dataset_io, "data/out/application_data_train", select_best_model_instance.get_segment_cols())
+    df_segments_test = _load_segments(dataset_io, "data/out/application_data_test", select_best_model_instance.get_segment_cols())
+    select_best_model_instance.select_best_model(df_data_train, df_data_test, df_segments_train, df_segments_test, n_jobs)
 
-def main():
-    process_select_best_model()
+def main(n_jobs=1, profile=False):
+    with StageMetrics("select", profile=profile):
+        process_select_best_model(n_jobs)
 
 if __name__ == "__main__":
     fire.Fire(main)
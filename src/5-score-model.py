@@ -1,53 +1,156 @@
 import fire
+import numpy as np
 import pandas as pd
 import os
-import pickle
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from artifact_cache import ArtifactCache
+from dataset_io import DatasetIO
+from instrumentation import StageMetrics, instrumented
+from model_store import ModelArtifact
+import score_server
 
 
 class ScoreModel:
     _output_path_train = ""
-    _output_path_preprocess = ""
+    _artifact_cache = None
+    _inference_engine = "sklearn"
+    _inference_engines = ("sklearn", "packed")
 
-    def __init__(self, output_path_train, output_path_preprocess):
+    def __init__(self, output_path_train, inference_engine="sklearn"):
+        if inference_engine not in self._inference_engines:
+            raise ValueError(f"Unknown inference engine '{inference_engine}', expected one of: {', '.join(self._inference_engines)}")
         self._output_path_train = output_path_train
-        self._output_path_preprocess = output_path_preprocess
-
-    def prepare_impute_missing(self, df_data_score, x_cols):
-        df_data_imputed = df_data_score.copy()
-        df_impute_parameters = pd.read_csv(f"{self._output_path_preprocess}/impute_missing_parameters.csv")
-        for col in x_cols:
-            impute_value = df_impute_parameters[df_impute_parameters["variable"]==col]["impute_value"].values[0]
-            df_data_imputed[col] = df_data_imputed[col].fillna(impute_value)
+        self._inference_engine = inference_engine
+        self._artifact_cache = ArtifactCache()
+
+    def _get_model_path(self):
+        return f'{self._output_path_train}/models/best_model'
+
+    def _get_model_artifact(self):
+        # Renaming a new artifact file into place changes the directory, which makes the cache load it again
+        return self._artifact_cache.get(self._get_model_path(), ModelArtifact.load)
+
+    @instrumented
+    def _load_estimator(self, path):
+        return self._get_model_artifact().load_estimator()
+
+    def _load_packed_model(self, path):
+        return self._get_model_artifact().load_packed_forest()
+
+    def _load_transform(self, path):
+        return self._get_model_artifact().get_transform()
+
+    def _get_best_model(self):
+        return self._artifact_cache.get(self._get_model_path(), self._load_estimator)
+
+    def _get_packed_model(self):
+        return self._artifact_cache.get(self._get_model_path(), self._load_packed_model)
+
+    def _get_inference_model(self):
+        if self._inference_engine == "packed":
+            return self._get_packed_model()
+        return self._get_best_model()
+
+    def _get_features_name(self):
+        return self._get_model_artifact().get_feature_names()
+
+    def _get_transform(self):
+        # The artifact carries the imputation the model was trained with, so scoring does not depend on a later preprocess run
+        return self._artifact_cache.get(self._get_model_path(), self._load_transform)
+
+    def get_required_columns(self):
+        return self._get_transform().get_feature_names()
+
+    def load_artifacts(self):
+        self._get_inference_model()
+        self._get_features_name()
+        self._get_transform()
+
+    def prepare_impute_missing(self, df_data_score, preprocess_transform):
+        df_data_imputed = preprocess_transform.transform_frame(df_data_score)
         return df_data_imputed
 
     def prepare_dataset(self, df_data):
-        x_cols = pd.read_csv(f"{self._output_path_preprocess}/final_variables.csv")["variable"].values.tolist()
-        df_data_prepared = df_data[x_cols]
-        df_data_prepared = self.prepare_impute_missing(df_data_prepared, x_cols)
+        df_data_prepared = self.prepare_impute_missing(df_data, self._get_transform())
 
         return df_data_prepared
 
+    @instrumented
     def score_model(self, df_data_score):
-        with open(f'{self._output_path_train}/models/best_model.pickle', 'rb') as handle:
-            best_model = pickle.load(handle)
-
-        features = pd.read_csv(f'{self._output_path_train}/feature_importance.csv')['variable'].to_list()
+        best_model = self._get_best_model()
+        features = self._get_features_name()
 
         y_pred = best_model.predict_proba(df_data_score[features])
         df_data_score['y_pred'] = y_pred[:,1]
         return df_data_score
 
+    @instrumented
     def score_preprocess_model(self, df_data_score):
+        # The prepared frame already holds the model features in training order, so it is scored without reselecting
         df_data_score_prepared = self.prepare_dataset(df_data_score)
-        df_data_score_prepared_y_pred = self.score_model(df_data_score_prepared)
-        return df_data_score_prepared_y_pred, df_data_score_prepared_y_pred['y_pred']
-
-
-def process_score_model():
+        y_pred = self._get_inference_model().predict_proba(df_data_score_prepared)
+        df_data_score_prepared['y_pred'] = y_pred[:,1]
+        return df_data_score_prepared, df_data_score_prepared['y_pred']
+
+    def score_records(self, records):
+        if len(records) == 0:
+            return []
+        x_cols = self.get_required_columns()
+        df_data_score = pd.DataFrame.from_records(records, columns=x_cols).astype(np.float64)
+        df_data_score_pred, y_pred = self.score_preprocess_model(df_data_score)
+        return y_pred.to_list()
+
+    @instrumented
+    def score_preprocess_model_chunked(self, input_dataset_path, output_path_data_pred, output_path_y_pred, chunk_size=100000, n_jobs=1):
+        # Chunks are scored in input order and appended, so peak memory follows chunk_size * in-flight chunks
+        n_rows = 0
+        for chunk_index, df_data_score_pred in enumerate(self._iterate_scored_chunks(input_dataset_path, chunk_size, n_jobs)):
+            write_header = chunk_index == 0
+            write_mode = 'w' if write_header else 'a'
+            df_data_score_pred.to_csv(output_path_data_pred, mode=write_mode, header=write_header)
+            df_data_score_pred['y_pred'].to_csv(output_path_y_pred, mode=write_mode, header=write_header)
+            n_rows += len(df_data_score_pred)
+        return n_rows
+
+    def _iterate_scored_chunks(self, input_dataset_path, chunk_size, n_jobs):
+        df_chunks = DatasetIO().iterate_dataset_chunks(input_dataset_path, chunk_size, columns=self.get_required_columns())
+        if n_jobs == 1:
+            for df_chunk in df_chunks:
+                df_data_score_pred, _y_pred = self.score_preprocess_model(df_chunk)
+                yield df_data_score_pred
+            return
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_chunk_worker,
+                                 initargs=(self._output_path_train, self._inference_engine)) as executor:
+            pending = collections.deque()
+            for df_chunk in df_chunks:
+                pending.append(executor.submit(_score_chunk, df_chunk))
+                if len(pending) >= 2 * n_jobs:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+_chunk_score_model = None
+
+
+def _init_chunk_worker(output_path_train, inference_engine):
+    global _chunk_score_model
+    _chunk_score_model = ScoreModel(output_path_train, inference_engine)
+    _chunk_score_model.load_artifacts()
+
+
+def _score_chunk(df_chunk):
+    df_data_score_pred, _y_pred = _chunk_score_model.score_preprocess_model(df_chunk)
+    return df_data_score_pred
+
+
+def process_score_model(inference_engine):
     if (os.getcwd().endswith("src")):
         os.chdir("..")
-    df_data_score = pd.read_csv("data/out/application_data_test_prepared.csv")
-    score_model_instance = ScoreModel(output_path_train="outputs/train", output_path_preprocess="outputs/preprocess")
+    score_model_instance = ScoreModel(output_path_train="outputs/train", inference_engine=inference_engine)
+    df_data_score = DatasetIO().load_dataset("data/out/application_data_test_prepared", columns=score_model_instance.get_required_columns())
     df_data_score_pred, y_pred = score_model_instance.score_preprocess_model(df_data_score)
 
     if (not (os.path.exists("data/score"))):
@@ -57,8 +160,42 @@ def process_score_model():
     return y_pred
 
 
-def main():
-    process_score_model()
+def process_score_model_chunked(chunk_size, n_jobs, inference_engine):
+    if (os.getcwd().endswith("src")):
+        os.chdir("..")
+    score_model_instance = ScoreModel(output_path_train="outputs/train", inference_engine=inference_engine)
+
+    if (not (os.path.exists("data/score"))):
+        os.mkdir("data/score")
+    n_rows = score_model_instance.score_preprocess_model_chunked("data/out/application_data_test_prepared",
+                                                                 "data/score/df_data_score_pred.csv",
+                                                                 "data/score/y_pred_score.csv", chunk_size, n_jobs)
+    return n_rows
+
+
+def process_serve_model(mode, host, port, max_batch_size, max_wait_ms, inference_engine):
+    if (os.getcwd().endswith("src")):
+        os.chdir("..")
+    score_model_instance = ScoreModel(output_path_train="outputs/train", inference_engine=inference_engine)
+    score_model_instance.load_artifacts()
+    if mode == "http":
+        return score_server.serve_http(score_model_instance.score_records, host, port, max_batch_size, max_wait_ms)
+    return score_server.serve_jsonl(score_model_instance.score_records, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+
+def main(mode="batch", host="127.0.0.1", port=8080, max_batch_size=256, max_wait_ms=5, chunk_size=None, n_jobs=1,
+         inference_engine="sklearn", profile=False):
+    # The servers report their own latency statistics; per-request spans would grow the metrics file without bound
+    if (mode == "batch") and (chunk_size is not None):
+        with StageMetrics("score", profile=profile):
+            process_score_model_chunked(chunk_size, n_jobs, inference_engine)
+    elif mode == "batch":
+        with StageMetrics("score", profile=profile):
+            process_score_model(inference_engine)
+    elif mode in ("http", "jsonl"):
+        process_serve_model(mode, host, port, max_batch_size, max_wait_ms, inference_engine)
+    else:
+        raise ValueError(f"Unknown mode '{mode}', expected one of: batch, http, jsonl")
 
 if __name__ == "__main__":
     fire.Fire(main)
@@ -0,0 +1,31 @@
+import os
+import threading
+
+
+class ArtifactCache:
+    _entries = None
+    _lock = None
+
+    def __init__(self):
+        self._entries = {}
+        # Re-entrant, as a loader may build its artifact from another cached one
+        self._lock = threading.RLock()
+
+    def _get_fingerprint(self, path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, loader):
+        # A stat call per lookup is all a warm artifact costs; the loader only runs again when the file changes
+        fingerprint = self._get_fingerprint(path)
+        key = (path, loader)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is None) or (entry[0] != fingerprint):
+                entry = (fingerprint, loader(path))
+                self._entries[key] = entry
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class SortedScores:
+    _is_positive = None
+    _group_starts = None
+
+    def __init__(self, y_values, scores, positive_label):
+        # Scores are sorted once; every AUC after that, of a bootstrap replicate or a segment, is a weighted pass
+        # over the sorted order. Tied scores form one group, so they count half, as in the trapezoidal ROC area.
+        # The positive label comes from the whole sample, as a segment may hold a single class.
+        y_values = np.asarray(y_values).ravel()
+        scores = np.asarray(scores).ravel()
+        order = np.argsort(scores, kind="mergesort")
+        sorted_scores = scores[order]
+        self._is_positive = (y_values == positive_label)[order]
+        self._group_starts = np.flatnonzero(np.r_[True, sorted_scores[1:] != sorted_scores[:-1]]) if len(scores) else np.array([0])
+
+    def get_n_rows(self):
+        return len(self._is_positive)
+
+    def get_n_positive(self):
+        return int(self._is_positive.sum())
+
+    def compute_weighted_aucs(self, weights):
+        # One AUC per row of weights, each weight being how many times a row (in sorted order) is counted
+        weights = np.asarray(weights, dtype=np.float64)
+        positive_weights = np.where(self._is_positive, weights, 0.0)
+        positive_groups = np.add.reduceat(positive_weights, self._group_starts, axis=1)
+        negative_groups = np.add.reduceat(weights - positive_weights, self._group_starts, axis=1)
+        negative_below = np.cumsum(negative_groups, axis=1) - negative_groups
+        pair_count = positive_groups.sum(axis=1) * negative_groups.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (positive_groups * (negative_below + negative_groups / 2)).sum(axis=1) / pair_count
+
+    def compute_auc(self):
+        if self.get_n_rows() == 0:
+            return np.nan
+        return self.compute_weighted_aucs(np.ones((1, self.get_n_rows())))[0]
+
+    def compute_bootstrap_aucs(self, n_replicates, rng, max_block_cells=5000000):
+        # Resampling with replacement is a count per row: the draws of each replicate are binned into its own
+        # row of a replicates x rows matrix, filled a block of replicates at a time
+        n_rows = self.get_n_rows()
+        if n_rows == 0:
+            return np.full(n_replicates, np.nan)
+        block_size = max(1, max_block_cells // n_rows)
+        aucs = []
+        for block_start in range(0, n_replicates, block_size):
+            n_block = min(block_size, n_replicates - block_start)
+            draws = rng.integers(0, n_rows, size=(n_block, n_rows)) + np.arange(n_block)[:, np.newaxis] * n_rows
+            weights = np.bincount(draws.ravel(), minlength=n_block * n_rows).reshape(n_block, n_rows)
+            aucs.append(self.compute_weighted_aucs(weights))
+        return np.concatenate(aucs)
+
+
+_worker_sorted_segments = None
+
+
+def _init_bootstrap_worker(sorted_segments):
+    # Every worker receives the sorted segments once, so a task only carries its segment index and seed
+    global _worker_sorted_segments
+    _worker_sorted_segments = sorted_segments
+
+
+def _compute_bootstrap_block(segment_index, n_replicates, seed):
+    return _worker_sorted_segments[segment_index].compute_bootstrap_aucs(n_replicates, np.random.default_rng(seed))
+
+
+class AucEvaluation:
+    _n_bootstrap = 1000
+    _confidence_level = 0.95
+    _random_state = 0
+    _n_jobs = 1
+    _replicates_per_task = 100
+
+    def __init__(self, n_bootstrap=1000, confidence_level=0.95, random_state=0, n_jobs=1):
+        if not (0 < confidence_level < 1):
+            raise ValueError(f"confidence_level must be between 0 and 1, got {confidence_level}")
+        self._n_bootstrap = n_bootstrap
+        self._confidence_level = confidence_level
+        self._random_state = random_state
+        self._n_jobs = os.cpu_count() if n_jobs < 0 else n_jobs
+
+    def _get_positive_label(self, y_values):
+        y_classes = np.unique(y_values)
+        if len(y_classes) > 2:
+            raise ValueError(f"AUC requires a binary target, found {len(y_classes)} classes.")
+        # A sample with a single class has no AUC; its rows count as positive only if that class is the usual 1
+        return y_classes[-1] if len(y_classes) == 2 else 1
+
+    def _iterate_segments(self, sample, y_values, scores, df_segments):
+        positive_label = self._get_positive_label(y_values)
+        yield {"sample": sample, "segment_col": "all", "segment_value": "all"}, SortedScores(y_values, scores, positive_label)
+        if df_segments is None:
+            return
+        for segment_col in df_segments.columns:
+            for segment_value, positions in df_segments.groupby(segment_col, observed=True, sort=True).indices.items():
+                yield ({"sample": sample, "segment_col": segment_col, "segment_value": segment_value},
+                       SortedScores(y_values[positions], scores[positions], positive_label))
+
+    def _build_tasks(self, n_segments):
+        # The replicates of each segment are split in fixed blocks with a seed of their own, so the intervals
+        # are the same whichever n_jobs computes them
+        n_blocks = -(-self._n_bootstrap // self._replicates_per_task)
+        seeds = np.random.SeedSequence(self._random_state).spawn(n_segments * n_blocks)
+        tasks = []
+        for segment_index in range(n_segments):
+            for block_index in range(n_blocks):
+                n_replicates = min(self._replicates_per_task, self._n_bootstrap - block_index * self._replicates_per_task)
+                tasks.append((segment_index, n_replicates, seeds[segment_index * n_blocks + block_index]))
+        return tasks
+
+    def _run_tasks(self, sorted_segments, tasks):
+        if self._n_jobs == 1:
+            return [sorted_segments[segment_index].compute_bootstrap_aucs(n_replicates, np.random.default_rng(seed))
+                    for segment_index, n_replicates, seed in tasks]
+        with ProcessPoolExecutor(max_workers=self._n_jobs, initializer=_init_bootstrap_worker, initargs=(sorted_segments,)) as executor:
+            futures = [executor.submit(_compute_bootstrap_block, *task) for task in tasks]
+            return [future.result() for future in futures]
+
+    def evaluate(self, samples):
+        # samples maps each sample name to its target, cached scores and optional segment columns (same row order)
+        segments = []
+        for sample, (y_values, scores, df_segments) in samples.items():
+            segments += list(self._iterate_segments(sample, np.asarray(y_values).ravel(), np.asarray(scores).ravel(), df_segments))
+        sorted_segments = [sorted_scores for _segment, sorted_scores in segments]
+        tasks = self._build_tasks(len(segments))
+        bootstrap_aucs = [[] for _ in segments]
+        for task, aucs in zip(tasks, self._run_tasks(sorted_segments, tasks)):
+            bootstrap_aucs[task[0]].append(aucs)
+
+        alpha = (1 - self._confidence_level) / 2
+        rows = []
+        for (segment, sorted_scores), segment_bootstrap_aucs in zip(segments, bootstrap_aucs):
+            aucs = np.concatenate(segment_bootstrap_aucs) if segment_bootstrap_aucs else np.array([])
+            # Replicates that drew a single class have no AUC and are left out of the interval
+            aucs = aucs[~np.isnan(aucs)]
+            lower, upper = np.quantile(aucs, [alpha, 1 - alpha]) if len(aucs) else (np.nan, np.nan)
+            rows.append({**segment, "n_rows": sorted_scores.get_n_rows(), "n_positive": sorted_scores.get_n_positive(),
+                         "auc": sorted_scores.compute_auc(), "auc_ci_lower": lower, "auc_ci_upper": upper,
+                         "n_bootstrap": len(aucs)})
+        return pd.DataFrame(rows)
@@ -0,0 +1,87 @@
+import fire
+import itertools
+import json
+import os
+from client_month_aggregation import ClientMonthAggregation
+from dataset_io import DatasetIO
+from dataset_schema import DatasetSchema
+from instrumentation import StageMetrics, instrumented
+
+
+class BuildClientFeatures:
+    _output_path = ""
+    _category_cols = ["TIPO_REQUERIMIENTO2", "DICTAMEN", "PRODUCTO_SERVICIO_2"]
+    _windows = [1, 3, 6]
+    _lag_months = 0
+    _schema_chunk_size = 100000
+    _client_month_aggregation = None
+
+    def __init__(self, output_path):
+        self._output_path = output_path
+        self._create_output_path()
+        self._client_month_aggregation = ClientMonthAggregation(self._category_cols, windows=self._windows, lag_months=self._lag_months)
+
+    def _create_output_path(self):
+        if not(os.path.exists(self._output_path)):
+            os.makedirs(self._output_path)
+
+    @instrumented
+    def infer_dataset_schema(self, dataset_io, dataset_paths, table_name, columns=None):
+        # One schema per table, inferred over all of its files, so every sample loads with the same compact types
+        df_chunks = itertools.chain.from_iterable(dataset_io.iterate_dataset_chunks(dataset_path, self._schema_chunk_size, columns=columns)
+                                                  for dataset_path in dataset_paths)
+        dataset_schema = DatasetSchema.infer(df_chunks)
+        dataset_schema.save(f"{self._output_path}/{table_name}_schema.json")
+        return dataset_schema
+
+    @instrumented
+    def fit_categories(self, df_events_train):
+        # Categories come from the training events only, so every sample gets the same feature columns
+        categories = self._client_month_aggregation.fit_categories(df_events_train)
+        with open(f"{self._output_path}/client_feature_categories.json", "w") as handle:
+            json.dump({"category_cols": self._category_cols, "categories": categories,
+                       "windows": self._windows, "lag_months": self._lag_months}, handle, indent=1)
+        return categories
+
+    @instrumented
+    def build_client_features(self, df_events, df_clients):
+        df_clients_features = self._client_month_aggregation.join_features(df_events, df_clients)
+        return df_clients_features
+
+    def get_feature_names(self):
+        return self._client_month_aggregation.get_feature_names()
+
+
+def process_build_client_features(samples):
+    if (os.getcwd().endswith('src')):
+        os.chdir("..")
+    dataset_io = DatasetIO()
+    build_client_features_instance = BuildClientFeatures("outputs/features")
+    event_cols = ["ID_CORRELATIVO", "CODMES"] + build_client_features_instance._category_cols
+    # Samples without a clients table (currently train) have nothing to join the features onto
+    samples_clients = [sample for sample in samples if dataset_io.find_dataset_path(f"data/{sample}_clientes_sample") is not None]
+    events_schema = build_client_features_instance.infer_dataset_schema(
+        dataset_io, [f"data/{sample}_requerimientos_sample" for sample in samples], "requerimientos", columns=event_cols)
+    clients_schema = build_client_features_instance.infer_dataset_schema(
+        dataset_io, [f"data/{sample}_clientes_sample" for sample in samples_clients], "clientes")
+    df_events_train = dataset_io.load_dataset("data/train_requerimientos_sample", columns=event_cols, dataset_schema=events_schema)
+    build_client_features_instance.fit_categories(df_events_train)
+
+    if (not (os.path.exists("data/out"))):
+        os.mkdir("data/out")
+    for sample in samples_clients:
+        df_events = dataset_io.load_dataset(f"data/{sample}_requerimientos_sample", columns=event_cols, dataset_schema=events_schema)
+        df_clients = dataset_io.load_dataset(f"data/{sample}_clientes_sample", dataset_schema=clients_schema)
+        df_clients_features = build_client_features_instance.build_client_features(df_events, df_clients)
+        dataset_io.save_dataset(df_clients_features, f"data/out/{sample}_clientes_features")
+
+
+SAMPLES = ["train", "oot"]
+
+
+def main(profile=False):
+    with StageMetrics("client_features", profile=profile):
+        process_build_client_features(SAMPLES)
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,98 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class ClientMonthAggregation:
+    _id_col = "ID_CORRELATIVO"
+    _month_col = "CODMES"
+    _feature_prefix = "NRO_REQ"
+    _category_cols = []
+    _categories = {}
+    _windows = [1, 3, 6]
+    _lag_months = 0
+
+    def __init__(self, category_cols, categories=None, windows=(1, 3, 6), lag_months=0):
+        self._category_cols = list(category_cols)
+        self._categories = {} if categories is None else {col: list(categories[col]) for col in self._category_cols}
+        self._windows = sorted(windows)
+        self._lag_months = lag_months
+
+    def fit_categories(self, df_events):
+        self._categories = {col: sorted(df_events[col].dropna().unique().tolist()) for col in self._category_cols}
+        return self._categories
+
+    def get_categories(self):
+        return self._categories
+
+    def _format_category(self, category):
+        return re.sub(r"[^0-9A-Za-z]+", "_", str(category)).strip("_").upper()
+
+    def get_feature_names(self):
+        # Per window: the total count first, then one count per category of each column
+        feature_names = []
+        for window in self._windows:
+            feature_names.append(f"{self._feature_prefix}_ULT{window}M")
+            for col in self._category_cols:
+                feature_names += [f"{self._feature_prefix}_{col}_{self._format_category(category)}_ULT{window}M"
+                                  for category in self._categories[col]]
+        return feature_names
+
+    def _compute_month_numbers(self, codmes):
+        codmes = np.asarray(codmes, dtype=np.int32)
+        return (codmes // 100) * 12 + codmes % 100 - 1
+
+    def _compute_category_codes(self, df_events):
+        # Values not seen when the categories were fitted get code -1 and only add to the total count
+        return [pd.Categorical(df_events[col], categories=self._categories[col]).codes for col in self._category_cols]
+
+    def compute_features(self, df_events, df_clients):
+        if not self._categories:
+            self.fit_categories(df_events)
+        # Events are sorted once by month, so every trailing window is a contiguous slice found by binary search.
+        # Months are offset into uint16 first, where the stable argsort is a linear-time radix sort.
+        event_months = self._compute_month_numbers(df_events[self._month_col])
+        first_month = event_months.min() if len(event_months) else 0
+        event_order = np.argsort((event_months - first_month).astype(np.uint16), kind="stable")
+        event_months = event_months[event_order]
+        event_ids = df_events[self._id_col].to_numpy()[event_order]
+        event_codes = [codes[event_order] for codes in self._compute_category_codes(df_events)]
+        n_categories = [len(self._categories[col]) for col in self._category_cols]
+        n_window_features = 1 + sum(n_categories)
+
+        client_months = self._compute_month_numbers(df_clients[self._month_col])
+        client_ids = df_clients[self._id_col].to_numpy()
+        features = np.zeros((len(df_clients), n_window_features * len(self._windows)), dtype=np.int32)
+        for month in np.unique(client_months):
+            # Client rows of one reference month are looked up through a hash index of their ids. The windows
+            # share their last month, so each one is a suffix of the longest window's event slice.
+            client_rows = np.flatnonzero(client_months == month)
+            client_index = pd.Index(client_ids[client_rows])
+            if not client_index.is_unique:
+                raise ValueError(f"Clients table has repeated {self._id_col} values for {self._month_col} month {month}")
+            n_rows = len(client_rows)
+            start = np.searchsorted(event_months, month - self._lag_months - self._windows[-1] + 1, side="left")
+            stop = np.searchsorted(event_months, month - self._lag_months, side="right")
+            event_rows = client_index.get_indexer(event_ids[start:stop])
+            month_features = np.empty((n_rows, features.shape[1]), dtype=features.dtype)
+            for window_index, window in enumerate(self._windows):
+                window_start = np.searchsorted(event_months, month - self._lag_months - window + 1, side="left")
+                window_rows = event_rows[window_start - start:]
+                is_client = window_rows >= 0
+                local_rows = window_rows[is_client]
+
+                col_offset = window_index * n_window_features
+                month_features[:, col_offset] = np.bincount(local_rows, minlength=n_rows)
+                col_offset += 1
+                for codes, n_category in zip(event_codes, n_categories):
+                    codes = codes[window_start:stop][is_client].astype(np.int64)
+                    is_known = codes >= 0
+                    counts = np.bincount(local_rows[is_known] * n_category + codes[is_known], minlength=n_rows * n_category)
+                    month_features[:, col_offset:col_offset + n_category] = counts.reshape(n_rows, n_category)
+                    col_offset += n_category
+            features[client_rows] = month_features
+        return pd.DataFrame(features, columns=self.get_feature_names(), index=df_clients.index)
+
+    def join_features(self, df_events, df_clients):
+        return pd.concat([df_clients, self.compute_features(df_events, df_clients)], axis=1)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+
+class CorrelationPruning:
+    _x_cols = []
+    _x_unit_columns = None
+    _block_size = 512
+
+    def __init__(self, df_data, x_cols, block_size=512, sample_rows=None, random_state=0):
+        self._x_cols = list(x_cols)
+        self._block_size = block_size
+        x_matrix = df_data[self._x_cols].to_numpy(dtype=np.float64)
+        if (sample_rows is not None) and (sample_rows < x_matrix.shape[0]):
+            rng = np.random.default_rng(random_state)
+            x_matrix = x_matrix[np.sort(rng.choice(x_matrix.shape[0], size=sample_rows, replace=False))]
+        self._x_unit_columns = self._compute_unit_columns(x_matrix)
+
+    def _compute_unit_columns(self, x_matrix):
+        # Centered columns scaled to unit norm, so the Pearson correlation of two columns is their dot product.
+        # Columns with missing values or zero variance get a zero vector, as pandas reports NaN for them on imputed data.
+        x_columns = np.ascontiguousarray(x_matrix.T)
+        x_columns -= x_columns.mean(axis=1, keepdims=True)
+        norms = np.sqrt((x_columns ** 2).sum(axis=1, keepdims=True))
+        valid = np.isfinite(norms) & (norms > 0)
+        x_columns /= np.where(valid, norms, 1.0)
+        x_columns[~valid[:, 0]] = 0.0
+        return x_columns
+
+    def compute_correlation_pairs(self, correlation_cutoff):
+        n_cols = len(self._x_cols)
+        index_1_list, index_2_list, corr_list = [], [], []
+        for block_start in range(0, n_cols, self._block_size):
+            block_end = min(block_start + self._block_size, n_cols)
+            corr_block = np.abs(self._x_unit_columns[block_start:block_end] @ self._x_unit_columns[block_start:].T)
+            upper_triangle = np.arange(block_start, n_cols)[np.newaxis, :] > np.arange(block_start, block_end)[:, np.newaxis]
+            # Rounding noise can push a perfect correlation slightly above one, which the original cutoff `corr < 1` excluded
+            pairs_mask = upper_triangle & (corr_block >= correlation_cutoff) & (corr_block < 1 - 1e-12)
+            rows, cols = np.nonzero(pairs_mask)
+            index_1_list.append(rows + block_start)
+            index_2_list.append(cols + block_start)
+            corr_list.append(corr_block[rows, cols])
+
+        x_cols_array = np.array(self._x_cols, dtype=object)
+        index_1 = np.concatenate(index_1_list) if index_1_list else np.array([], dtype=np.int64)
+        index_2 = np.concatenate(index_2_list) if index_2_list else np.array([], dtype=np.int64)
+        corr = np.concatenate(corr_list) if corr_list else np.array([], dtype=np.float64)
+        df_corr_pairs = pd.DataFrame({"variable_1": x_cols_array[index_1],
+                                      "variable_2": x_cols_array[index_2],
+                                      "corr": corr})
+        return df_corr_pairs
+
@@ -0,0 +1,456 @@
+import json
+import os
+import shutil
+import struct
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrumented
+
+
+def _iterate_arrow_batches(data_format, path, batch_size=None, columns=None):
+    # Parquet is read a row group at a time and feather (an Arrow IPC file) a record batch at a time
+    import pyarrow as pa
+    if data_format == "parquet":
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size or 65536, columns=columns)
+        return
+    reader = pa.ipc.open_file(path)
+    for batch_index in range(reader.num_record_batches):
+        batch = reader.get_batch(batch_index)
+        yield batch if columns is None else pa.Table.from_batches([batch]).select(columns).to_batches()[0]
+
+
+class DatasetIO:
+    _data_format = "npy"
+    _export_csv = False
+    _format_extensions = {"npy": ".npyd", "parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
+    _schema_file_name = "schema.json"
+    _csv_chunk_size = 100000
+
+    def __init__(self, data_format=None, export_csv=None):
+        if data_format is None:
+            data_format = os.environ.get("DATASET_FORMAT", self._data_format)
+        if export_csv is None:
+            export_csv = os.environ.get("DATASET_EXPORT_CSV", "0").lower() in ("1", "true", "yes")
+        if data_format not in self._format_extensions:
+            raise ValueError(f"Unknown dataset format '{data_format}', expected one of: {', '.join(self._format_extensions)}")
+        self._data_format = data_format
+        self._export_csv = export_csv
+
+    def get_data_format(self):
+        return self._data_format
+
+    def _strip_extension(self, dataset_path):
+        for extension in self._format_extensions.values():
+            if dataset_path.endswith(extension):
+                return dataset_path[:-len(extension)]
+        return dataset_path
+
+    def _find_dataset(self, dataset_path):
+        # The configured format wins; otherwise any format present is read, e.g. a raw CSV input or an older run
+        dataset_name = self._strip_extension(dataset_path)
+        data_formats = [self._data_format] + [data_format for data_format in self._format_extensions if data_format != self._data_format]
+        for data_format in data_formats:
+            path = dataset_name + self._format_extensions[data_format]
+            if os.path.exists(path):
+                return data_format, path
+        raise FileNotFoundError(f"No dataset found for '{dataset_path}' in any of the formats: {', '.join(data_formats)}")
+
+    def find_dataset_path(self, dataset_path):
+        try:
+            return self._find_dataset(dataset_path)[1]
+        except FileNotFoundError:
+            return None
+
+    @instrumented
+    def save_dataset(self, df_data, dataset_path):
+        dataset_name = self._strip_extension(dataset_path)
+        path = dataset_name + self._format_extensions[self._data_format]
+        if self._data_format == "npy":
+            self._save_npy(df_data, path)
+        elif self._data_format == "parquet":
+            df_data.to_parquet(path, index=False)
+        elif self._data_format == "feather":
+            df_data.reset_index(drop=True).to_feather(path)
+        else:
+            df_data.to_csv(path, index=False)
+        if self._export_csv and (self._data_format != "csv"):
+            df_data.to_csv(dataset_name + ".csv", index=False)
+        self._remove_stale_formats(dataset_name)
+        return path
+
+    def open_dataset_writer(self, dataset_path):
+        # Chunks are appended as they come, so a dataset can be written without ever holding it in memory
+        dataset_name = self._strip_extension(dataset_path)
+        path = dataset_name + self._format_extensions[self._data_format]
+        self._remove_stale_formats(dataset_name)
+        export_csv_path = dataset_name + ".csv" if (self._export_csv and (self._data_format != "csv")) else None
+        return DatasetWriter(self._data_format, path, export_csv_path)
+
+    def _remove_stale_formats(self, dataset_name):
+        # A copy left behind in another format would otherwise be picked up by a reader configured for that format
+        for data_format, extension in self._format_extensions.items():
+            if (data_format == self._data_format) or ((data_format == "csv") and self._export_csv):
+                continue
+            path = dataset_name + extension
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    @instrumented
+    def load_dataset(self, dataset_path, columns=None, dataset_schema=None):
+        # With a dataset schema every column arrives in its compact type; text, npy and CSV data are cast column
+        # by column or chunk by chunk, so the dataset is never held at its stored width
+        data_format, path = self._find_dataset(dataset_path)
+        if data_format == "npy":
+            return self._load_npy(path, columns, dataset_schema)
+        if data_format == "csv":
+            return self._load_csv(path, columns, dataset_schema)
+        if data_format == "parquet":
+            df_data = pd.read_parquet(path, columns=columns)
+        else:
+            df_data = pd.read_feather(path, columns=columns)
+        return df_data if dataset_schema is None else dataset_schema.cast_frame(df_data)
+
+    def _load_csv(self, path, columns, dataset_schema):
+        if dataset_schema is None:
+            df_data = pd.read_csv(path, usecols=columns)
+            return df_data if columns is None else df_data[columns]
+        df_data = pd.concat(self._iterate_csv_chunks(path, self._csv_chunk_size, columns, dataset_schema), ignore_index=True)
+        # Chunks that met values the schema has not seen end up with their own category lists, which concat turns to object
+        for col in df_data.columns:
+            if dataset_schema.has_column(col) and (dataset_schema.get_dtype(col) == "category") and (df_data[col].dtype == object):
+                df_data[col] = dataset_schema.cast_column(col, df_data[col])
+        return df_data
+
+    def _iterate_csv_chunks(self, path, chunk_size, columns, dataset_schema):
+        read_dtypes = dataset_schema.get_read_dtypes(columns) if dataset_schema is not None else None
+        for df_chunk in pd.read_csv(path, usecols=columns, dtype=read_dtypes, chunksize=chunk_size):
+            df_chunk = df_chunk if columns is None else df_chunk[columns]
+            yield df_chunk if dataset_schema is None else dataset_schema.cast_frame(df_chunk)
+
+    def iterate_dataset_chunks(self, dataset_path, chunk_size, columns=None, dataset_schema=None):
+        data_format, path = self._find_dataset(dataset_path)
+        if data_format == "npy":
+            yield from self._iterate_npy_chunks(path, chunk_size, columns, dataset_schema)
+        elif data_format == "csv":
+            yield from self._iterate_csv_chunks(path, chunk_size, columns, dataset_schema)
+        else:
+            yield from self._iterate_arrow_chunks(data_format, path, chunk_size, columns, dataset_schema)
+
+    def _iterate_arrow_chunks(self, data_format, path, chunk_size, columns, dataset_schema):
+        # Batches are regrouped into chunks of chunk_size rows, so only one chunk and one batch are in memory at a time
+        import pyarrow as pa
+        pending = []
+        n_pending = 0
+        start = 0
+        for batch in _iterate_arrow_batches(data_format, path, chunk_size, columns):
+            pending.append(batch)
+            n_pending += batch.num_rows
+            while n_pending >= chunk_size:
+                table = pa.Table.from_batches(pending)
+                yield self._build_arrow_frame(table.slice(0, chunk_size), start, dataset_schema)
+                start += chunk_size
+                pending = table.slice(chunk_size).to_batches()
+                n_pending -= chunk_size
+        if n_pending:
+            yield self._build_arrow_frame(pa.Table.from_batches(pending), start, dataset_schema)
+
+    def _build_arrow_frame(self, table, start, dataset_schema):
+        df_chunk = table.to_pandas()
+        df_chunk.index = pd.RangeIndex(start, start + len(df_chunk))
+        return df_chunk if dataset_schema is None else dataset_schema.cast_frame(df_chunk)
+
+    def load_dataset_columns(self, dataset_path):
+        data_format, path = self._find_dataset(dataset_path)
+        if data_format == "npy":
+            return [column["name"] for column in self._read_schema(path)["columns"]]
+        if data_format == "csv":
+            return pd.read_csv(path, nrows=0).columns.to_list()
+        import pyarrow as pa
+        if data_format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_schema(path).names
+        return pa.ipc.open_file(path).schema.names
+
+    def _save_npy(self, df_data, path):
+        # One typed .npy file per column plus a JSON schema; text columns are stored as category codes
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        schema_columns = []
+        for col_index, col in enumerate(df_data.columns):
+            file_name = f"col_{col_index:05d}.npy"
+            schema_column = {"name": col, "file": file_name}
+            values = df_data[col]
+            if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+                schema_column["categories"] = values.cat.categories.to_list()
+                schema_column["dtype"] = "category"
+                column_array = values.cat.codes.to_numpy()
+            else:
+                column_array = values.to_numpy()
+                schema_column["dtype"] = str(column_array.dtype)
+            np.save(os.path.join(path, file_name), column_array, allow_pickle=False)
+            schema_columns.append(schema_column)
+        with open(os.path.join(path, self._schema_file_name), "w") as handle:
+            json.dump({"n_rows": len(df_data), "columns": schema_columns}, handle)
+
+    def _read_schema(self, path):
+        with open(os.path.join(path, self._schema_file_name)) as handle:
+            return json.load(handle)
+
+    def _select_schema_columns(self, schema, columns):
+        if columns is None:
+            return schema["columns"]
+        schema_columns_by_name = {column["name"]: column for column in schema["columns"]}
+        missing_columns = [col for col in columns if col not in schema_columns_by_name]
+        if missing_columns:
+            raise KeyError(f"Columns not found in dataset: {missing_columns}")
+        return [schema_columns_by_name[col] for col in columns]
+
+    def _build_frame(self, path, schema_columns, start, stop, dataset_schema=None):
+        # Columns are cast straight from the memory-mapped file, so only the compact copy is ever allocated
+        data = {}
+        for schema_column in schema_columns:
+            column_array = np.load(os.path.join(path, schema_column["file"]), mmap_mode="r")[start:stop]
+            if schema_column["dtype"] == "category":
+                values = pd.Categorical.from_codes(column_array, schema_column["categories"])
+                if dataset_schema is None:
+                    values = values.astype(object)
+            else:
+                values = column_array if dataset_schema is not None else np.array(column_array)
+            if dataset_schema is not None:
+                values = dataset_schema.cast_column(schema_column["name"], values)
+                if isinstance(values, np.ndarray) and not values.flags.owndata:
+                    values = values.copy()
+            data[schema_column["name"]] = values
+        return pd.DataFrame(data, index=pd.RangeIndex(start, stop))
+
+    def _load_npy(self, path, columns, dataset_schema=None):
+        schema = self._read_schema(path)
+        return self._build_frame(path, self._select_schema_columns(schema, columns), 0, schema["n_rows"], dataset_schema)
+
+    def _iterate_npy_chunks(self, path, chunk_size, columns, dataset_schema=None):
+        schema = self._read_schema(path)
+        schema_columns = self._select_schema_columns(schema, columns)
+        for start in range(0, schema["n_rows"], chunk_size):
+            yield self._build_frame(path, schema_columns, start, min(start + chunk_size, schema["n_rows"]), dataset_schema)
+
+
+class DatasetWriter:
+    _data_format = "npy"
+    _path = ""
+    _export_csv_path = None
+    _n_rows = 0
+    _npy_columns = None
+    _arrow_writer = None
+    _arrow_schema = None
+    _arrow_path = ""
+    _arrow_non_null_cols = None
+    _n_arrow_rewrites = 0
+    _schema_file_name = DatasetIO._schema_file_name
+    _npy_header_size = 128
+    _promote_block_rows = 1000000
+
+    def __init__(self, data_format, path, export_csv_path=None):
+        self._data_format = data_format
+        self._path = path
+        self._export_csv_path = export_csv_path
+        self._n_rows = 0
+        self._npy_columns = None
+        self._arrow_writer = None
+        self._arrow_schema = None
+        self._arrow_path = path
+        self._arrow_non_null_cols = set()
+        self._n_arrow_rewrites = 0
+        if data_format == "npy":
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.makedirs(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_chunk(self, df_chunk):
+        if self._data_format == "npy":
+            self._write_npy_chunk(df_chunk)
+        elif self._data_format in ("parquet", "feather"):
+            self._write_arrow_chunk(df_chunk)
+        else:
+            df_chunk.to_csv(self._path, mode="w" if self._n_rows == 0 else "a", header=self._n_rows == 0, index=False)
+        if self._export_csv_path is not None:
+            df_chunk.to_csv(self._export_csv_path, mode="w" if self._n_rows == 0 else "a", header=self._n_rows == 0, index=False)
+        self._n_rows += len(df_chunk)
+
+    def _open_arrow_writer(self, path, schema):
+        import pyarrow as pa
+        if self._data_format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(path, schema)
+        return pa.ipc.new_file(path, schema)
+
+    def _write_arrow_chunk(self, df_chunk):
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df_chunk, preserve_index=False).replace_schema_metadata(None)
+        # Category columns are written as their values, so chunks with different category lists share one type
+        table = table.cast(pa.schema([pa.field(field.name, field.type.value_type) if pa.types.is_dictionary(field.type) else field
+                                      for field in table.schema]))
+        if self._arrow_writer is None:
+            self._arrow_schema = table.schema
+            self._arrow_writer = self._open_arrow_writer(self._arrow_path, table.schema)
+        schema = self._widen_arrow_schema(table)
+        if not schema.equals(self._arrow_schema):
+            self._rewrite_arrow_file(schema)
+        self._arrow_writer.write_table(table.cast(self._arrow_schema, safe=False))
+        self._arrow_non_null_cols.update(name for name, column in zip(table.column_names, table.columns)
+                                         if column.null_count < len(column))
+
+    def _widen_arrow_schema(self, table):
+        import pyarrow as pa
+        if table.column_names != self._arrow_schema.names:
+            raise ValueError(f"Chunk columns {table.column_names} differ from those of the first chunk {self._arrow_schema.names}")
+        return pa.schema([pa.field(field.name, self._widen_arrow_type(field, column)) for field, column in zip(self._arrow_schema, table.columns)])
+
+    def _widen_arrow_type(self, field, column):
+        import pyarrow as pa
+        if (column.type == field.type) or (column.null_count == len(column)):
+            return field.type
+        if field.name not in self._arrow_non_null_cols:
+            # A column missing in every row so far takes the type of its first values, as in the npy writer
+            return column.type
+        is_numeric = [pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_boolean(arrow_type)
+                      for arrow_type in (field.type, column.type)]
+        if all(is_numeric):
+            # Integers that meet a missing value arrive as floats
+            return pa.from_numpy_dtype(np.result_type(field.type.to_pandas_dtype(), column.type.to_pandas_dtype()))
+        raise ValueError(f"Column '{field.name}' is {field.type} in earlier chunks and {column.type} in a later one")
+
+    def _rewrite_arrow_file(self, schema):
+        # The schema of a parquet or feather file is fixed once written, so the rows written so far are copied batch by
+        # batch to a file with the widened schema, which replaces the dataset on close
+        import pyarrow as pa
+        self._arrow_writer.close()
+        self._n_arrow_rewrites += 1
+        arrow_path = f"{self._path}.{self._n_arrow_rewrites}.tmp"
+        arrow_writer = self._open_arrow_writer(arrow_path, schema)
+        for batch in _iterate_arrow_batches(self._data_format, self._arrow_path):
+            arrow_writer.write_table(pa.Table.from_batches([batch]).cast(schema, safe=False))
+        os.remove(self._arrow_path)
+        self._arrow_path, self._arrow_writer, self._arrow_schema = arrow_path, arrow_writer, schema
+
+    def _write_npy_header(self, handle, dtype, n_rows):
+        # Fixed-size version 1.0 header, rewritten in place with the final row count on close
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(dtype), n_rows)
+        header = header.ljust(self._npy_header_size - 11) + "\n"
+        handle.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+    def _open_npy_columns(self, df_chunk):
+        self._npy_columns = []
+        for col_index, col in enumerate(df_chunk.columns):
+            values = df_chunk[col]
+            is_category = values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype)
+            npy_column = {"name": col, "file": f"col_{col_index:05d}.npy",
+                          "dtype": np.dtype(np.int32) if is_category else values.to_numpy().dtype,
+                          "categories": {} if is_category else None}
+            npy_column["handle"] = open(os.path.join(self._path, npy_column["file"]), "wb")
+            self._write_npy_header(npy_column["handle"], npy_column["dtype"], 0)
+            self._npy_columns.append(npy_column)
+
+    def _encode_categories(self, npy_column, values):
+        # Codes follow the order in which categories first appear, so they stay valid across chunks
+        chunk_categorical = pd.Categorical(values)
+        categories = npy_column["categories"]
+        for category in chunk_categorical.categories:
+            categories.setdefault(category, len(categories))
+        lookup = np.array([categories[category] for category in chunk_categorical.categories] + [-1], dtype=np.int32)
+        return lookup[chunk_categorical.codes]
+
+    def _iterate_written_blocks(self, npy_column):
+        file_path = os.path.join(self._path, npy_column["file"])
+        if self._n_rows == 0:
+            return
+        if not npy_column["handle"].closed:
+            npy_column["handle"].flush()
+        column_array = np.memmap(file_path, dtype=npy_column["dtype"], mode="r", offset=self._npy_header_size, shape=(self._n_rows,))
+        for start in range(0, self._n_rows, self._promote_block_rows):
+            yield column_array[start:start + self._promote_block_rows]
+        del column_array
+
+    def _rewrite_npy_column(self, npy_column, dtype, convert_block):
+        # Rows already written are converted block by block into a new file that replaces the old one
+        file_path = os.path.join(self._path, npy_column["file"])
+        npy_column["handle"].close()
+        with open(file_path + ".promote", "wb") as handle:
+            self._write_npy_header(handle, dtype, 0)
+            for block in self._iterate_written_blocks(npy_column):
+                handle.write(np.ascontiguousarray(convert_block(block), dtype=dtype).tobytes())
+        os.replace(file_path + ".promote", file_path)
+        npy_column["dtype"] = dtype
+        npy_column["handle"] = open(file_path, "r+b")
+        npy_column["handle"].seek(0, os.SEEK_END)
+
+    def _promote_npy_column(self, npy_column, dtype):
+        # A later chunk can need a wider type, e.g. integers followed by missing values
+        self._rewrite_npy_column(npy_column, dtype, lambda block: block.astype(dtype))
+
+    def _is_all_missing(self, npy_column):
+        if npy_column["dtype"].kind != "f":
+            return self._n_rows == 0
+        return all(np.isnan(block).all() for block in self._iterate_written_blocks(npy_column))
+
+    def _convert_npy_column_to_categories(self, npy_column):
+        # A text column whose first rows are all missing is parsed as float; once text arrives it becomes a
+        # category column and the rows already written become missing codes
+        if not self._is_all_missing(npy_column):
+            raise ValueError(f"Column '{npy_column['name']}' mixes numbers and text across chunks")
+        self._rewrite_npy_column(npy_column, np.dtype(np.int32), lambda block: np.full(len(block), -1, dtype=np.int32))
+        npy_column["categories"] = {}
+
+    def _write_npy_chunk(self, df_chunk):
+        if self._npy_columns is None:
+            self._open_npy_columns(df_chunk)
+        for npy_column in self._npy_columns:
+            values = df_chunk[npy_column["name"]]
+            is_category = values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype)
+            if is_category and (npy_column["categories"] is None):
+                self._convert_npy_column_to_categories(npy_column)
+            if npy_column["categories"] is not None:
+                column_array = self._encode_categories(npy_column, values)
+            else:
+                column_array = values.to_numpy()
+                dtype = np.result_type(npy_column["dtype"], column_array.dtype)
+                if dtype != npy_column["dtype"]:
+                    self._promote_npy_column(npy_column, dtype)
+            npy_column["handle"].write(np.ascontiguousarray(column_array, dtype=npy_column["dtype"]).tobytes())
+
+    def _close_npy(self):
+        schema_columns = []
+        for npy_column in self._npy_columns or []:
+            npy_column["handle"].seek(0)
+            self._write_npy_header(npy_column["handle"], npy_column["dtype"], self._n_rows)
+            npy_column["handle"].close()
+            schema_column = {"name": npy_column["name"], "file": npy_column["file"]}
+            if npy_column["categories"] is not None:
+                schema_column["categories"] = list(npy_column["categories"])
+                schema_column["dtype"] = "category"
+            else:
+                schema_column["dtype"] = str(npy_column["dtype"])
+            schema_columns.append(schema_column)
+        with open(os.path.join(self._path, self._schema_file_name), "w") as handle:
+            json.dump({"n_rows": self._n_rows, "columns": schema_columns}, handle)
+
+    def close(self):
+        if self._data_format == "npy":
+            self._close_npy()
+        elif self._arrow_writer is not None:
+            self._arrow_writer.close()
+            if self._arrow_path != self._path:
+                os.replace(self._arrow_path, self._path)
+        return self._path
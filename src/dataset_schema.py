@@ -0,0 +1,150 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class DatasetSchema:
+    _columns = []
+    _columns_by_name = {}
+    _integer_dtypes = [np.int8, np.int16, np.int32, np.int64]
+    _float_dtype = np.float32
+    _max_exact_float32 = 2 ** 24
+    _max_category_ratio = 0.5
+
+    def __init__(self, columns):
+        self._columns = list(columns)
+        self._columns_by_name = {column["name"]: column for column in self._columns}
+
+    @classmethod
+    def _update_stats(cls, stats, values):
+        stats["n_rows"] += len(values)
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            stats["kind"] = "text"
+            stats["categories"].update(values.dropna().unique().tolist())
+            return
+        if values.dtype == bool:
+            stats["kind"] = "bool" if stats["kind"] is None else stats["kind"]
+            return
+        if values.dtype.kind not in "iuf":
+            stats["kind"] = "other"
+            stats["dtype"] = str(values.dtype)
+            return
+        column_array = values.to_numpy()
+        if stats["kind"] == "text":
+            # An all-missing chunk of a text column is parsed as float and tells nothing about the column
+            return
+        stats["kind"] = "numeric"
+        is_missing = np.isnan(column_array) if column_array.dtype.kind == "f" else None
+        if (is_missing is not None) and is_missing.any():
+            stats["has_missing"] = True
+            column_array = column_array[~is_missing]
+        if len(column_array) == 0:
+            return
+        stats["min"] = min(stats["min"], column_array.min())
+        stats["max"] = max(stats["max"], column_array.max())
+        if stats["is_integral"] and (column_array.dtype.kind == "f"):
+            stats["is_integral"] = bool(np.all(np.mod(column_array, 1) == 0))
+
+    @classmethod
+    def _get_integer_dtype(cls, min_value, max_value):
+        for dtype in cls._integer_dtypes:
+            if (np.iinfo(dtype).min <= min_value) and (max_value <= np.iinfo(dtype).max):
+                return dtype
+        return np.float64
+
+    @classmethod
+    def _choose_column(cls, name, stats):
+        # Complete integer columns (flags, counts, codes) get the smallest integer type holding their range.
+        # Any other number is float32, unless it is an integer too large for float32 to hold exactly.
+        if stats["kind"] == "text":
+            if len(stats["categories"]) > cls._max_category_ratio * stats["n_rows"]:
+                return {"name": name, "dtype": "object"}
+            return {"name": name, "dtype": "category", "categories": sorted(stats["categories"], key=str)}
+        if stats["kind"] == "bool":
+            return {"name": name, "dtype": "bool"}
+        if stats["kind"] == "other":
+            return {"name": name, "dtype": stats["dtype"]}
+        if stats["min"] > stats["max"]:
+            return {"name": name, "dtype": np.dtype(cls._float_dtype).name}
+        if stats["is_integral"] and not stats["has_missing"]:
+            return {"name": name, "dtype": np.dtype(cls._get_integer_dtype(stats["min"], stats["max"])).name}
+        if stats["is_integral"] and max(abs(stats["min"]), abs(stats["max"])) > cls._max_exact_float32:
+            return {"name": name, "dtype": "float64"}
+        return {"name": name, "dtype": np.dtype(cls._float_dtype).name}
+
+    @classmethod
+    def infer(cls, df_chunks):
+        # One pass over the chunks keeps running ranges, integrality and category sets, so the whole dataset
+        # never has to be in memory at its original width
+        column_stats = {}
+        for df_chunk in df_chunks:
+            for col in df_chunk.columns:
+                stats = column_stats.setdefault(col, {"kind": None, "n_rows": 0, "has_missing": False, "is_integral": True,
+                                                      "min": np.inf, "max": -np.inf, "categories": set()})
+                cls._update_stats(stats, df_chunk[col])
+        return cls([cls._choose_column(col, stats) for col, stats in column_stats.items()])
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as handle:
+            return cls(json.load(handle)["columns"])
+
+    def save(self, path):
+        with open(path, "w") as handle:
+            json.dump({"columns": self._columns}, handle, indent=1, default=str)
+
+    def get_columns(self):
+        return self._columns
+
+    def has_column(self, col):
+        return col in self._columns_by_name
+
+    def get_dtype(self, col):
+        return self._columns_by_name[col]["dtype"]
+
+    def get_read_dtypes(self, columns=None):
+        # Types a CSV parser can produce directly; integer columns are parsed as they are and cast afterwards,
+        # since a missing value in a column that had none would make an integer parse fail
+        read_dtypes = {}
+        for column in self._columns:
+            if (columns is not None) and (column["name"] not in columns):
+                continue
+            if column["dtype"] in ("float32", "float64", "category"):
+                read_dtypes[column["name"]] = column["dtype"]
+        return read_dtypes
+
+    def _cast_categorical(self, values, categories):
+        # Values the schema has not seen are kept as extra categories after the known ones rather than lost
+        categorical = pd.Categorical(values)
+        known_categories = set(categories)
+        new_categories = sorted((category for category in categorical.categories if category not in known_categories), key=str)
+        return categorical.set_categories(categories + new_categories)
+
+    def cast_column(self, col, values):
+        column = self._columns_by_name.get(col)
+        if column is None:
+            return values
+        dtype = column["dtype"]
+        if dtype == "category":
+            return self._cast_categorical(values, column["categories"])
+        if (dtype != "bool") and not dtype.startswith(("float", "int")):
+            return values
+        column_array = np.asarray(values)
+        if dtype.startswith("float"):
+            return column_array.astype(dtype, copy=False)
+        # A new dataset can break what the schema saw: missing or fractional values make the column float,
+        # a wider range makes the integer type wider
+        if column_array.dtype.kind == "f":
+            is_missing = np.isnan(column_array)
+            if is_missing.any() or not np.all(np.mod(column_array, 1) == 0):
+                return column_array.astype(self._float_dtype, copy=False)
+        if dtype == "bool":
+            return column_array.astype(bool, copy=False)
+        if len(column_array) == 0:
+            return column_array.astype(dtype, copy=False)
+        integer_dtype = np.promote_types(dtype, self._get_integer_dtype(column_array.min(), column_array.max()))
+        return column_array.astype(integer_dtype, copy=False)
+
+    def cast_frame(self, df_data):
+        return pd.DataFrame({col: self.cast_column(col, df_data[col]) for col in df_data.columns}, index=df_data.index, copy=False)
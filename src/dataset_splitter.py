@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrumented
+
+
+class DatasetSplitter:
+    _key_col = "SK_ID_CURR"
+    _train_fraction = 0.7
+    _seed = 0
+    _stratify_col = None
+    _time_col = None
+    _test_start = None
+    _stratum_rows = None
+    _stratum_train_rows = None
+
+    def __init__(self, key_col, train_fraction=0.7, seed=0, stratify_col=None, time_col=None, test_start=None):
+        if (time_col is None) != (test_start is None):
+            raise ValueError("time_col and test_start have to be given together")
+        self._key_col = key_col
+        self._train_fraction = train_fraction
+        self._seed = seed
+        self._stratify_col = stratify_col
+        self._time_col = time_col
+        self._test_start = test_start
+        self._stratum_rows = {}
+        self._stratum_train_rows = {}
+
+    def compute_key_hashes(self, keys):
+        # Uniform values in [0, 1) that depend only on the key and the seed, whatever the chunking or row order
+        keys = np.asarray(keys)
+        if keys.dtype.kind in "iub":
+            hashes = keys.astype(np.uint64) + np.uint64((self._seed * 0x9E3779B97F4A7C15) % 2 ** 64)
+            hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            hashes = hashes ^ (hashes >> np.uint64(31))
+        else:
+            hashes = pd.util.hash_array(keys.astype(str).astype(object), hash_key=f"{self._seed:016d}"[-16:])
+        return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+    def _assign_stratified(self, key_hashes, strata):
+        # Each stratum gets the training rows its running quota asks for, taken by lowest key hash within
+        # the chunk, so the class ratio stays within one row of train_fraction in both outputs
+        is_train = np.zeros(len(key_hashes), dtype=bool)
+        stratum_codes, stratum_values = pd.factorize(strata, use_na_sentinel=False)
+        for stratum_code, stratum_value in enumerate(stratum_values):
+            rows = np.flatnonzero(stratum_codes == stratum_code)
+            n_rows_seen = self._stratum_rows.get(stratum_value, 0) + len(rows)
+            n_train_seen = self._stratum_train_rows.get(stratum_value, 0)
+            n_train = int(np.floor(self._train_fraction * n_rows_seen + 0.5)) - n_train_seen
+            is_train[rows[np.argsort(key_hashes[rows], kind="stable")[:n_train]]] = True
+            self._stratum_rows[stratum_value] = n_rows_seen
+            self._stratum_train_rows[stratum_value] = n_train_seen + n_train
+        return is_train
+
+    def assign_train(self, df_chunk):
+        if self._key_col not in df_chunk.columns:
+            raise KeyError(f"Split key column '{self._key_col}' not found in the dataset")
+        if self._time_col is not None:
+            return df_chunk[self._time_col].to_numpy() < self._test_start
+        key_hashes = self.compute_key_hashes(df_chunk[self._key_col].to_numpy())
+        if self._stratify_col is not None:
+            return self._assign_stratified(key_hashes, df_chunk[self._stratify_col].to_numpy())
+        return key_hashes < self._train_fraction
+
+    @instrumented
+    def split_dataset(self, dataset_io, input_dataset_path, output_path_train, output_path_test, chunk_size=100000):
+        # One pass over the input; peak memory follows chunk_size, not the dataset size
+        self._stratum_rows, self._stratum_train_rows = {}, {}
+        n_rows_train, n_rows_test = 0, 0
+        with dataset_io.open_dataset_writer(output_path_train) as writer_train, dataset_io.open_dataset_writer(output_path_test) as writer_test:
+            for df_chunk in dataset_io.iterate_dataset_chunks(input_dataset_path, chunk_size):
+                is_train = self.assign_train(df_chunk)
+                writer_train.write_chunk(df_chunk[is_train])
+                writer_test.write_chunk(df_chunk[~is_train])
+                n_rows_train += int(is_train.sum())
+                n_rows_test += int((~is_train).sum())
+        return n_rows_train, n_rows_test
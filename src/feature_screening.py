@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+
+class FeatureScreening:
+    _x_cols = []
+    _x_columns = None
+    _missing_mask = None
+    _counts = None
+    _means = None
+    _describe_percentiles = [0.25, 0.50, 0.75]
+    _auc_block_size = 16
+
+    def __init__(self, df_data, x_cols):
+        # One contiguous row per column, so every per-column reduction, sort and scan runs over adjacent memory
+        self._x_cols = list(x_cols)
+        self._x_columns = np.ascontiguousarray(df_data[self._x_cols].to_numpy(dtype=np.float64).T)
+        self._missing_mask = np.isnan(self._x_columns)
+        self._counts = self._x_columns.shape[1] - self._missing_mask.sum(axis=1)
+        sums = np.where(self._missing_mask, 0.0, self._x_columns).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self._means = np.where(self._counts > 0, sums / self._counts, np.nan)
+
+    def compute_missing_counts(self):
+        return self._x_columns.shape[1] - self._counts
+
+    def compute_means(self):
+        return self._means
+
+    def compute_stds(self):
+        deviations = np.where(self._missing_mask, 0.0, self._x_columns - self._means[:, np.newaxis])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self._counts > 1, np.sqrt((deviations ** 2).sum(axis=1) / (self._counts - 1)), np.nan)
+
+    def _compute_sorted_quantiles(self, quantiles):
+        # np.sort places NaN at the end of each column, so the first `count` values are the observed ones
+        x_sorted = np.sort(self._x_columns, axis=1)
+        last_position = np.maximum(self._counts - 1, 0)
+        values = []
+        for quantile in quantiles:
+            position = quantile * last_position
+            position_low = np.floor(position).astype(np.int64)
+            position_high = np.ceil(position).astype(np.int64)
+            value_low = np.take_along_axis(x_sorted, position_low[:, np.newaxis], axis=1)[:, 0]
+            value_high = np.take_along_axis(x_sorted, position_high[:, np.newaxis], axis=1)[:, 0]
+            value = value_low + (value_high - value_low) * (position - position_low)
+            values.append(np.where(self._counts > 0, value, np.nan))
+        return values
+
+    def compute_descriptive_statistics(self):
+        quantiles = [0.0] + self._describe_percentiles + [1.0]
+        quantile_values = self._compute_sorted_quantiles(quantiles)
+        df_descriptive_statistics = pd.DataFrame({'variable': self._x_cols,
+                                                  'count': self._counts.astype(np.float64),
+                                                  'mean': self._means,
+                                                  'std': self.compute_stds(),
+                                                  'min': quantile_values[0]})
+        for percentile, value in zip(self._describe_percentiles, quantile_values[1:-1]):
+            df_descriptive_statistics[f'{percentile:.0%}'] = value
+        df_descriptive_statistics['max'] = quantile_values[-1]
+        return df_descriptive_statistics
+
+    def compute_imputed_column(self, col_index, impute_value):
+        return np.where(self._missing_mask[col_index], impute_value, self._x_columns[col_index])
+
+    def _compute_sorted_average_ranks(self, x_sorted_columns):
+        n_values = x_sorted_columns.shape[1]
+        positions = np.arange(n_values)[np.newaxis, :]
+        is_tie_with_previous = np.zeros(x_sorted_columns.shape, dtype=bool)
+        is_tie_with_previous[:, 1:] = x_sorted_columns[:, 1:] == x_sorted_columns[:, :-1]
+        is_tie_with_next = np.zeros(x_sorted_columns.shape, dtype=bool)
+        is_tie_with_next[:, :-1] = is_tie_with_previous[:, 1:]
+        tie_start = np.maximum.accumulate(np.where(is_tie_with_previous, 0, positions), axis=1)
+        tie_end = np.minimum.accumulate(np.where(is_tie_with_next, n_values - 1, positions)[:, ::-1], axis=1)[:, ::-1]
+        return (tie_start + tie_end) / 2 + 1
+
+    def compute_bivariate_auc(self, y_values, impute_values=None):
+        y_values = np.asarray(y_values).ravel()
+        y_classes = np.unique(y_values)
+        if len(y_classes) != 2:
+            raise ValueError(f"Bivariate AUC requires a binary target, found {len(y_classes)} classes.")
+        y_positive = y_values == y_classes[1]
+        n_positive = y_positive.sum()
+        n_negative = len(y_values) - n_positive
+
+        # Mann-Whitney form of the AUC: tied values share their average rank, which matches the trapezoidal ROC area.
+        # Columns are ranked in blocks, as the sort order, ranks and tie masks each take several times the block's memory.
+        if impute_values is None:
+            impute_values = self._means
+        impute_values = np.asarray(impute_values)
+        rank_sum_positive = np.empty(len(self._x_cols))
+        for block_start in range(0, len(self._x_cols), self._auc_block_size):
+            block = slice(block_start, block_start + self._auc_block_size)
+            x_imputed_columns = np.where(self._missing_mask[block], impute_values[block, np.newaxis], self._x_columns[block])
+            x_order = np.argsort(x_imputed_columns, axis=1)
+            x_sorted_columns = np.take_along_axis(x_imputed_columns, x_order, axis=1)
+            rank_sum_positive[block] = (self._compute_sorted_average_ranks(x_sorted_columns) * y_positive[x_order]).sum(axis=1)
+        auc = (rank_sum_positive - n_positive * (n_positive + 1) / 2) / (n_positive * n_negative)
+        auc = np.where(auc < 0.5, 1 - auc, auc)
+        # A column missing in every row has no impute value, so it is constant and its ranks would follow the row order
+        return np.where(self._counts > 0, auc, 0.5)
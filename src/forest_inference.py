@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class PackedForest:
+    _feature = None
+    _threshold = None
+    _leaf_values_by_class = None
+    _depth = 0
+    _feature_names = []
+    _max_supported_depth = 12
+    _batch_cells = 2 ** 16
+
+    def __init__(self, feature, threshold, leaf_values_by_class, depth, feature_names):
+        # Leaf values are held class-major, one row per class over all leaves of all trees, for per-class gathers.
+        # Arrays already in the right dtype and layout are used as they are, memory-mapped ones included.
+        self._feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self._threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self._leaf_values_by_class = np.ascontiguousarray(leaf_values_by_class, dtype=np.float64)
+        self._depth = int(depth)
+        self._feature_names = list(feature_names)
+
+    @classmethod
+    def supports_forest(cls, forest):
+        return max(estimator.tree_.max_depth for estimator in forest.estimators_) <= cls._max_supported_depth
+
+    @classmethod
+    def _pack_tree(cls, tree, depth):
+        # Every tree is laid out as a complete binary tree of the forest depth: the children of position i are
+        # 2i+1 and 2i+2. A leaf reached early is repeated below itself with an infinite threshold, so rows keep
+        # going left until the last level and land on a copy of that leaf.
+        n_internal = 2 ** depth - 1
+        feature = np.zeros(n_internal, dtype=np.int32)
+        threshold = np.full(n_internal, np.inf, dtype=np.float64)
+        nodes = np.zeros(1, dtype=np.intp)
+        for level in range(depth):
+            is_split = tree.children_left[nodes] != -1
+            positions = slice(2 ** level - 1, 2 ** (level + 1) - 1)
+            feature[positions] = np.where(is_split, tree.feature[nodes], 0)
+            threshold[positions] = np.where(is_split, tree.threshold[nodes], np.inf)
+            children = np.empty(2 * len(nodes), dtype=np.intp)
+            children[0::2] = np.where(is_split, tree.children_left[nodes], nodes)
+            children[1::2] = np.where(is_split, tree.children_right[nodes], nodes)
+            nodes = children
+        values = tree.value[nodes, 0, :]
+        return feature, threshold, values / values.sum(axis=1, keepdims=True)
+
+    @classmethod
+    def from_forest(cls, forest):
+        if not cls.supports_forest(forest):
+            raise ValueError(f"Only forests with trees of depth <= {cls._max_supported_depth} can be packed")
+        depth = max(estimator.tree_.max_depth for estimator in forest.estimators_)
+        packed_trees = [cls._pack_tree(estimator.tree_, depth) for estimator in forest.estimators_]
+        feature, threshold, leaf_values = (np.stack(arrays) for arrays in zip(*packed_trees))
+        feature_names = getattr(forest, "feature_names_in_", [])
+        leaf_values_by_class = leaf_values.reshape(-1, leaf_values.shape[2]).T
+        return cls(feature, cls._round_thresholds_down(threshold), leaf_values_by_class, depth, feature_names)
+
+    @staticmethod
+    def _round_thresholds_down(threshold):
+        # Inputs are float32 and sklearn compares them with float64 thresholds. Replacing each threshold by the
+        # largest float32 not above it keeps x <= threshold unchanged for every float32 x.
+        threshold_float32 = threshold.astype(np.float32)
+        rounded_up = threshold_float32.astype(np.float64) > threshold
+        threshold_float32[rounded_up] = np.nextafter(threshold_float32[rounded_up], np.float32(-np.inf))
+        return threshold_float32
+
+    @classmethod
+    def from_arrays(cls, arrays, depth, feature_names):
+        return cls(arrays["feature"], arrays["threshold"], arrays["leaf_values_by_class"], depth, feature_names)
+
+    def get_arrays(self):
+        return {"feature": self._feature, "threshold": self._threshold, "leaf_values_by_class": self._leaf_values_by_class}
+
+    def get_depth(self):
+        return self._depth
+
+    def get_feature_names(self):
+        return self._feature_names
+
+    def _predict_batch_proba(self, x_batch):
+        # All trees advance one level per step over the whole batch: position has shape (n_trees, n_rows)
+        n_trees, n_internal = self._feature.shape
+        n_rows, n_cols = x_batch.shape
+        x_flat = x_batch.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_cols)[np.newaxis, :]
+        tree_offsets = (np.arange(n_trees, dtype=np.int32) * n_internal)[:, np.newaxis]
+        feature, threshold = self._feature.ravel(), self._threshold.ravel()
+        position = np.zeros((n_trees, n_rows), dtype=np.int32)
+        for _level in range(self._depth):
+            node = position + tree_offsets
+            x_values = np.take(x_flat, row_offsets + np.take(feature, node, mode="clip"), mode="clip")
+            go_right = x_values > np.take(threshold, node, mode="clip")
+            position *= 2
+            position += 1
+            position += go_right
+        leaf = position - n_internal + (np.arange(n_trees, dtype=np.intp) * (n_internal + 1))[:, np.newaxis]
+        return np.stack([np.take(class_leaf_values, leaf, mode="clip").mean(axis=0)
+                         for class_leaf_values in self._leaf_values_by_class], axis=1)
+
+    def predict_proba(self, x_data):
+        x_matrix = np.ascontiguousarray(np.asarray(x_data, dtype=np.float32))
+        batch_size = max(1, self._batch_cells // self._feature.shape[0])
+        proba = np.empty((x_matrix.shape[0], self._leaf_values_by_class.shape[0]), dtype=np.float64)
+        for start in range(0, x_matrix.shape[0], batch_size):
+            proba[start:start + batch_size] = self._predict_batch_proba(x_matrix[start:start + batch_size])
+        return proba
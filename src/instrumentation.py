@@ -0,0 +1,237 @@
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import pstats
+import resource
+import threading
+import time
+
+import pandas as pd
+
+_active_stage_metrics = None
+
+
+def _read_proc_fields(path, names):
+    try:
+        with open(path) as handle:
+            lines = handle.read().splitlines()
+    except OSError:
+        return {}
+    fields = {}
+    for line in lines:
+        name, _sep, value = line.partition(":")
+        if name in names:
+            fields[name] = int(value.split()[0])
+    return fields
+
+
+class _Span:
+    _name = ""
+    _parent = None
+    _fields = None
+    _start = 0.0
+    _start_io = None
+    _rss_start_kb = None
+    _children_peak_kb = 0
+
+    def __init__(self, name, parent):
+        self._name = name
+        self._parent = parent
+        self._fields = {}
+        self._children_peak_kb = 0
+
+    def get_name(self):
+        return self._name
+
+    def set_fields(self, **fields):
+        self._fields.update(fields)
+
+    def set_shape(self, df_data, prefix=""):
+        self._fields[f"{prefix}n_rows"], self._fields[f"{prefix}n_cols"] = df_data.shape
+
+
+class StageMetrics:
+    _stage_name = ""
+    _output_path = "outputs/metrics"
+    _profile = False
+    _run_id = ""
+    _metrics_path = ""
+    _handle = None
+    _thread = None
+    _span_stack = None
+    _profiler = None
+    _can_reset_peak = False
+
+    def __init__(self, stage_name, output_path="outputs/metrics", profile=False):
+        self._stage_name = stage_name
+        self._output_path = output_path
+        self._profile = profile
+
+    def _resolve_output_path(self):
+        # Stage scripts move to the repository root once they start; the path is fixed before that happens
+        output_path = self._output_path
+        if (not os.path.isabs(output_path)) and os.getcwd().endswith("src"):
+            output_path = os.path.join("..", output_path)
+        return os.path.abspath(output_path)
+
+    def __enter__(self):
+        global _active_stage_metrics
+        output_path = self._resolve_output_path()
+        os.makedirs(output_path, exist_ok=True)
+        self._run_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{os.getpid()}"
+        self._metrics_path = os.path.join(output_path, f"{self._stage_name}_{self._run_id}.jsonl")
+        self._handle = open(self._metrics_path, "w")
+        self._thread = threading.current_thread()
+        self._span_stack = []
+        self._can_reset_peak = self._reset_peak_rss()
+        _active_stage_metrics = self
+        self._open_span(self._stage_name)
+        if self._profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_stage_metrics
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._save_profile()
+        while self._span_stack:
+            self._close_span(self._span_stack[-1], status="ok" if exc_type is None else exc_type.__name__)
+        _active_stage_metrics = None
+        self._handle.close()
+
+    def _save_profile(self):
+        profile_path = self._metrics_path.replace(".jsonl", ".prof")
+        self._profiler.dump_stats(profile_path)
+        with open(profile_path.replace(".prof", "_profile.txt"), "w") as handle:
+            pstats.Stats(self._profiler, stream=handle).sort_stats("cumulative").print_stats(40)
+
+    def get_metrics_path(self):
+        return self._metrics_path
+
+    def is_recording(self):
+        return threading.current_thread() is self._thread
+
+    def _reset_peak_rss(self):
+        # Writing 5 to clear_refs resets VmHWM on Linux, which gives every span its own peak
+        try:
+            with open("/proc/self/clear_refs", "w") as handle:
+                handle.write("5")
+            return True
+        except OSError:
+            return False
+
+    def _read_memory_kb(self):
+        fields = _read_proc_fields("/proc/self/status", ("VmRSS", "VmHWM"))
+        if not fields:
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak_kb, peak_kb
+        return fields["VmRSS"], fields["VmHWM"]
+
+    def _read_io_bytes(self):
+        fields = _read_proc_fields("/proc/self/io", ("rchar", "wchar"))
+        return (fields["rchar"], fields["wchar"]) if fields else None
+
+    def _open_span(self, name):
+        parent = self._span_stack[-1] if self._span_stack else None
+        span = _Span(name, parent)
+        rss_kb, peak_kb = self._read_memory_kb()
+        if self._can_reset_peak:
+            # The peak reached so far belongs to the enclosing span, which would otherwise lose it on reset
+            if parent is not None:
+                parent._children_peak_kb = max(parent._children_peak_kb, peak_kb)
+            self._reset_peak_rss()
+        span._rss_start_kb = rss_kb
+        span._start_io = self._read_io_bytes()
+        self._span_stack.append(span)
+        span._start = time.perf_counter()
+        return span
+
+    def _close_span(self, span, status="ok"):
+        seconds = time.perf_counter() - span._start
+        rss_kb, peak_kb = self._read_memory_kb()
+        peak_kb = max(peak_kb, span._children_peak_kb)
+        if span._parent is not None:
+            span._parent._children_peak_kb = max(span._parent._children_peak_kb, peak_kb)
+        end_io = self._read_io_bytes()
+        self._span_stack.remove(span)
+        event = {"run_id": self._run_id, "stage": self._stage_name, "span": span._name,
+                 "parent": span._parent.get_name() if span._parent is not None else None,
+                 "depth": len(self._span_stack), "status": status, "seconds": seconds,
+                 "rss_start_mb": span._rss_start_kb / 1024, "rss_end_mb": rss_kb / 1024, "peak_rss_mb": peak_kb / 1024,
+                 "io_read_mb": (end_io[0] - span._start_io[0]) / 1024 ** 2 if end_io and span._start_io else None,
+                 "io_write_mb": (end_io[1] - span._start_io[1]) / 1024 ** 2 if end_io and span._start_io else None}
+        event.update(span._fields)
+        self._write_event(event)
+
+    def _write_event(self, event):
+        self._handle.write(json.dumps(event, default=str) + "\n")
+        self._handle.flush()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        span = self._open_span(name)
+        status = "ok"
+        try:
+            yield span
+        except BaseException as error:
+            status = type(error).__name__
+            raise
+        finally:
+            self._close_span(span, status)
+
+    def record(self, name, **fields):
+        self._write_event(dict({"run_id": self._run_id, "stage": self._stage_name, "event": name,
+                                "parent": self._span_stack[-1].get_name() if self._span_stack else None}, **fields))
+
+
+def get_active_stage_metrics():
+    stage_metrics = _active_stage_metrics
+    if (stage_metrics is None) or (not stage_metrics.is_recording()):
+        return None
+    return stage_metrics
+
+
+def span(name):
+    stage_metrics = get_active_stage_metrics()
+    if stage_metrics is None:
+        return contextlib.nullcontext()
+    return stage_metrics.span(name)
+
+
+def record(name, **fields):
+    stage_metrics = get_active_stage_metrics()
+    if stage_metrics is not None:
+        stage_metrics.record(name, **fields)
+
+
+def _find_frame(candidates):
+    for candidate in candidates:
+        if isinstance(candidate, pd.DataFrame):
+            return candidate
+    return None
+
+
+def instrumented(function):
+    # Without an active StageMetrics in this thread the call goes straight through, so workers, benchmarks and
+    # the scoring server pay one global lookup per call
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        stage_metrics = get_active_stage_metrics()
+        if stage_metrics is None:
+            return function(*args, **kwargs)
+        with stage_metrics.span(function.__name__) as span:
+            result = function(*args, **kwargs)
+            # n_rows/n_cols describe the data the call handled, its first frame argument; the frame it returns,
+            # often a summary, is recorded apart
+            df_input = _find_frame(list(args) + list(kwargs.values()))
+            df_output = _find_frame(list(result) if isinstance(result, tuple) else [result])
+            if df_input is not None:
+                span.set_shape(df_input)
+            if df_output is not None:
+                span.set_shape(df_output, prefix="output_")
+            return result
+    return wrapper
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid, check_cv
+
+
+def _fit_growing_forest(estimator, params, n_estimators_list, x_data, y_data, train_index, test_index, scorer):
+    # One forest per fold is grown through the sorted n_estimators values; each step only fits the new trees.
+    # The fit time of a step adds up all steps before it, the time to fit the forest the candidate is scored with.
+    estimator = clone(estimator).set_params(warm_start=True, **params)
+    x_train, y_train = x_data.iloc[train_index], y_data[train_index]
+    x_test, y_test = x_data.iloc[test_index], y_data[test_index]
+    fold_results = []
+    fit_time = 0.0
+    for n_estimators in n_estimators_list:
+        start = time.perf_counter()
+        estimator.set_params(n_estimators=n_estimators).fit(x_train, y_train)
+        fit_time += time.perf_counter() - start
+        start = time.perf_counter()
+        score = scorer(estimator, x_test, y_test)
+        fold_results.append((fit_time, time.perf_counter() - start, score))
+    return fold_results
+
+
+class WarmStartForestSearch:
+    def __init__(self, estimator, param_grid, scoring='roc_auc', cv=5, n_jobs=None, refit=True):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.refit = refit
+
+    def fit(self, x_data, y_data):
+        y_data = np.asarray(y_data)
+        n_estimators_list = sorted(self.param_grid.get('n_estimators', [self.estimator.get_params()['n_estimators']]))
+        param_grid_other = {key: value for key, value in self.param_grid.items() if key != 'n_estimators'}
+        params_other_list = list(ParameterGrid(param_grid_other))
+        splits = list(check_cv(self.cv, y_data, classifier=True).split(x_data, y_data))
+        scorer = get_scorer(self.scoring)
+
+        fold_results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_growing_forest)(self.estimator, params, n_estimators_list, x_data, y_data, train_index, test_index, scorer)
+            for params in params_other_list for train_index, test_index in splits)
+        # Shape (candidate with other params, fold, n_estimators step, [fit_time, score_time, score])
+        fold_results = np.array(fold_results).reshape(len(params_other_list), len(splits), len(n_estimators_list), 3)
+        fold_results = fold_results.transpose(0, 2, 1, 3).reshape(-1, len(splits), 3)
+
+        test_scores = fold_results[:, :, 2]
+        self.cv_results_ = {'params': [dict(params, n_estimators=n_estimators) for params in params_other_list for n_estimators in n_estimators_list],
+                            'mean_fit_time': fold_results[:, :, 0].mean(axis=1),
+                            'std_fit_time': fold_results[:, :, 0].std(axis=1),
+                            'mean_score_time': fold_results[:, :, 1].mean(axis=1),
+                            'std_score_time': fold_results[:, :, 1].std(axis=1),
+                            'mean_test_score': test_scores.mean(axis=1),
+                            'std_test_score': test_scores.std(axis=1),
+                            'rank_test_score': rankdata(-test_scores.mean(axis=1), method='min').astype(np.int32)}
+        for split_index in range(len(splits)):
+            self.cv_results_[f'split{split_index}_test_score'] = test_scores[:, split_index]
+        self.n_splits_ = len(splits)
+        self.best_index_ = int(np.argmax(self.cv_results_['mean_test_score']))
+        self.best_params_ = self.cv_results_['params'][self.best_index_]
+        self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+        if hasattr(x_data, 'columns'):
+            self.feature_names_in_ = np.asarray(x_data.columns, dtype=object)
+
+        if self.refit:
+            start = time.perf_counter()
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(x_data, y_data)
+            self.refit_time_ = time.perf_counter() - start
+        return self
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import platform
+import time
+
+import joblib
+import numpy as np
+import sklearn
+
+from forest_inference import PackedForest
+from preprocess_transform import PreprocessTransform
+
+
+class ModelArtifact:
+    _format_version = 1
+    _manifest_file_name = "manifest.json"
+    _estimator_file_name = "estimator.joblib"
+    _arrays_file_name = "arrays.joblib"
+    _path = ""
+    _manifest = None
+    _arrays = None
+
+    def __init__(self, path, manifest, arrays):
+        self._path = path
+        self._manifest = manifest
+        self._arrays = arrays
+
+    @classmethod
+    def _write_file(cls, path, file_name, write):
+        # Files are written under a temporary name and renamed into place, so a scorer that still maps the
+        # previous version keeps reading an intact file
+        temp_path = os.path.join(path, f".{file_name}.{os.getpid()}.tmp")
+        write(temp_path)
+        file_hash = hashlib.sha256()
+        with open(temp_path, "rb") as handle:
+            for block in iter(lambda: handle.read(1024 * 1024), b""):
+                file_hash.update(block)
+        os.replace(temp_path, os.path.join(path, file_name))
+        return file_hash.hexdigest()
+
+    @classmethod
+    def save(cls, path, estimator, preprocess_transform, metadata=None):
+        feature_names = list(getattr(estimator, "feature_names_in_", preprocess_transform.get_feature_names()))
+        if feature_names != preprocess_transform.get_feature_names():
+            raise ValueError("The model was trained on other features than the ones the preprocess transform produces")
+        os.makedirs(path, exist_ok=True)
+
+        # Everything a scorer reads per row lives in plain arrays that are memory-mapped on load; the estimator
+        # itself is only needed by the sklearn engine
+        arrays = {"impute_values": np.asarray(preprocess_transform.get_impute_values(), dtype=np.float32)}
+        packed_forest = None
+        if PackedForest.supports_forest(estimator):
+            packed_forest = PackedForest.from_forest(estimator)
+            arrays.update({f"packed_{name}": array for name, array in packed_forest.get_arrays().items()})
+        files = {cls._estimator_file_name: cls._write_file(path, cls._estimator_file_name, lambda file_path: joblib.dump(estimator, file_path)),
+                 cls._arrays_file_name: cls._write_file(path, cls._arrays_file_name, lambda file_path: joblib.dump(arrays, file_path))}
+
+        manifest = {"format_version": cls._format_version,
+                    "model_version": hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()[:16],
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "model_class": f"{type(estimator).__module__}.{type(estimator).__name__}",
+                    "feature_names": feature_names,
+                    "dtypes": preprocess_transform.get_dtypes(),
+                    "packed_forest_depth": packed_forest.get_depth() if packed_forest is not None else None,
+                    "libraries": {"python": platform.python_version(), "sklearn": sklearn.__version__,
+                                  "numpy": np.__version__, "joblib": joblib.__version__},
+                    "files": files,
+                    "metadata": metadata if metadata is not None else {}}
+        cls._write_file(path, cls._manifest_file_name, lambda file_path: cls._write_manifest(file_path, manifest))
+        return cls(path, manifest, arrays)
+
+    @staticmethod
+    def _write_manifest(file_path, manifest):
+        with open(file_path, "w") as handle:
+            json.dump(manifest, handle, indent=1, default=str)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, cls._manifest_file_name)) as handle:
+            manifest = json.load(handle)
+        if manifest.get("format_version") != cls._format_version:
+            raise ValueError(f"Model artifact '{path}' has format version {manifest.get('format_version')}, "
+                             f"this code reads version {cls._format_version}")
+        # With mmap_mode the arrays are views of the page cache, which every process scoring the same file shares
+        arrays = joblib.load(os.path.join(path, cls._arrays_file_name), mmap_mode=mmap_mode)
+        return cls(path, manifest, arrays)
+
+    def get_path(self):
+        return self._path
+
+    def get_manifest(self):
+        return self._manifest
+
+    def get_model_version(self):
+        return self._manifest["model_version"]
+
+    def get_feature_names(self):
+        return self._manifest["feature_names"]
+
+    def get_impute_values(self):
+        return self._arrays["impute_values"]
+
+    def get_transform(self):
+        return PreprocessTransform(self.get_feature_names(), self.get_impute_values(), self._manifest["dtypes"])
+
+    def has_packed_forest(self):
+        return self._manifest["packed_forest_depth"] is not None
+
+    def load_packed_forest(self):
+        if not self.has_packed_forest():
+            raise ValueError(f"Model artifact '{self._path}' has no packed forest: its trees are deeper than the packed engine supports")
+        return PackedForest.from_arrays({name[len("packed_"):]: array for name, array in self._arrays.items() if name.startswith("packed_")},
+                                        self._manifest["packed_forest_depth"], self.get_feature_names())
+
+    def load_estimator(self):
+        # sklearn copies the tree arrays into buffers of its own, so mapping the estimator file would share nothing
+        return joblib.load(os.path.join(self._path, self._estimator_file_name))
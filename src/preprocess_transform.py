@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class PreprocessTransform:
+    _feature_names = []
+    _impute_values = None
+    _dtypes = {}
+    _matrix_dtype = np.float32
+
+    def __init__(self, feature_names, impute_values, dtypes):
+        self._feature_names = list(feature_names)
+        self._impute_values = np.asarray(impute_values, dtype=self._matrix_dtype)
+        self._dtypes = dict(dtypes)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as handle:
+            transform = json.load(handle)
+        return cls(transform["feature_names"], transform["impute_values"], transform["dtypes"])
+
+    def save(self, path):
+        transform = {"feature_names": self._feature_names,
+                     "impute_values": [float(value) for value in self._impute_values],
+                     "dtypes": self._dtypes,
+                     "matrix_dtype": np.dtype(self._matrix_dtype).name}
+        with open(path, "w") as handle:
+            json.dump(transform, handle, indent=1)
+
+    def get_feature_names(self):
+        return self._feature_names
+
+    def get_impute_values(self):
+        return self._impute_values
+
+    def get_dtypes(self):
+        return self._dtypes
+
+    def transform(self, df_data):
+        # Columns are copied straight into one C-ordered float32 matrix, the layout the forest evaluates on,
+        # and missing values are then filled in place in a single vectorized pass
+        x_matrix = np.empty((len(df_data), len(self._feature_names)), dtype=self._matrix_dtype)
+        for col_index, col in enumerate(self._feature_names):
+            x_matrix[:, col_index] = df_data[col].to_numpy()
+        np.copyto(x_matrix, self._impute_values[np.newaxis, :], where=np.isnan(x_matrix))
+        return x_matrix
+
+    def transform_frame(self, df_data):
+        return pd.DataFrame(self.transform(df_data), columns=self._feature_names, index=df_data.index, copy=False)
@@ -0,0 +1,230 @@
+import fire
+import pandas as pd
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataset_io import DatasetIO
+from instrumentation import StageMetrics
+
+SRC_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_stage(stage_file_name):
+    if SRC_PATH not in sys.path:
+        sys.path.insert(0, SRC_PATH)
+    module_name = stage_file_name.replace("-", "_").replace(".py", "")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SRC_PATH, stage_file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run_stage(stage_name, stage_file_name, function_name, kwargs, profile=False):
+    start = time.perf_counter()
+    with StageMetrics(stage_name, profile=profile):
+        getattr(_load_stage(stage_file_name), function_name)(**kwargs)
+    return time.perf_counter() - start
+
+
+class PipelineRunner:
+    _output_path = ""
+    _cache = None
+    _dataset_io = None
+    _hash_block_size = 1024 * 1024
+
+    def __init__(self, output_path):
+        self._output_path = output_path
+        self._dataset_io = DatasetIO()
+        self._create_output_path()
+        self._cache = self._read_cache()
+
+    def _create_output_path(self):
+        if not(os.path.exists(self._output_path)):
+            os.makedirs(self._output_path)
+
+    def _read_cache(self):
+        cache_path = f"{self._output_path}/pipeline_cache.json"
+        if not(os.path.exists(cache_path)):
+            return {"stages": {}, "file_hashes": {}}
+        with open(cache_path) as handle:
+            return json.load(handle)
+
+    def _save_cache(self):
+        with open(f"{self._output_path}/pipeline_cache.json", "w") as handle:
+            json.dump(self._cache, handle, indent=1, sort_keys=True)
+
+    def define_stages(self, search_strategy="grid", n_jobs=-1, inference_engine="sklearn"):
+        preprocess_module = _load_stage("1-preprocess-dataset-train.py")
+        split_module = _load_stage("0-split-dataset.py")
+        train_module = _load_stage("3-train-evaluate-models.py")
+        select_module = _load_stage("4-select-best-model.py")
+        client_features_module = _load_stage("build-client-features.py")
+        build_client_features_class = client_features_module.BuildClientFeatures
+        preprocess_data_class = preprocess_module.PreprocessData
+        select_best_model_class = select_module.SelectBestModel
+        return [
+            {"name": "split", "file": "0-split-dataset.py", "function": "process_split_data",
+             "kwargs": {"split_parameters": split_module.SPLIT_PARAMETERS, "chunk_size": split_module.CHUNK_SIZE},
+             "params": {}, "depends_on": [],
+             "inputs": ["data/in/application_data"],
+             "outputs": ["data/out/application_data_train", "data/out/application_data_test"],
+             "code": ["0-split-dataset.py", "dataset_splitter.py", "dataset_io.py"]},
+            {"name": "client_features", "file": "build-client-features.py", "function": "process_build_client_features",
+             "kwargs": {"samples": client_features_module.SAMPLES},
+             "params": {"category_cols": build_client_features_class._category_cols, "windows": build_client_features_class._windows,
+                        "lag_months": build_client_features_class._lag_months},
+             "depends_on": [],
+             "inputs": [f"data/{sample}_{table}_sample" for sample in client_features_module.SAMPLES for table in ["requerimientos", "clientes"]],
+             "outputs": [f"data/out/{sample}_clientes_features" for sample in client_features_module.SAMPLES] + ["outputs/features"],
+             "code": ["build-client-features.py", "client_month_aggregation.py", "dataset_schema.py", "dataset_io.py"]},
+            {"name": "preprocess", "file": "1-preprocess-dataset-train.py", "function": "process_preprocess_dataset",
+             "kwargs": {"x_cols": preprocess_module.X_COLS, "y_col": preprocess_module.Y_COL},
+             "params": {"correlation_cutoff": preprocess_data_class._correlation_cutoff,
+                        "auc_bivariate_cutoff": preprocess_data_class._auc_bivariate_cutoff,
+                        "correlation_sample_rows": preprocess_data_class._correlation_sample_rows},
+             "depends_on": ["split"],
+             "inputs": ["data/out/application_data_train"],
+             "outputs": ["data/out/application_data_train_prepared", "outputs/preprocess"],
+             "code": ["1-preprocess-dataset-train.py", "feature_screening.py", "correlation_pruning.py", "preprocess_transform.py",
+                      "dataset_schema.py", "dataset_io.py"]},
+            {"name": "prepare_test", "file": "2-prepare-dataset-test.py", "function": "process_prepare_dataset", "kwargs": {},
+             "params": {}, "depends_on": ["split", "preprocess"],
+             "inputs": ["data/out/application_data_test", "outputs/preprocess"],
+             "outputs": ["data/out/application_data_test_prepared"],
+             "code": ["2-prepare-dataset-test.py", "preprocess_transform.py", "dataset_schema.py", "dataset_io.py"]},
+            {"name": "train", "file": "3-train-evaluate-models.py", "function": "process_train_evaluate_models",
+             "kwargs": {"model_parameters_grid": train_module.MODEL_PARAMETERS_GRID, "search_strategy": search_strategy, "n_jobs": n_jobs},
+             "params": {"halving_factor": train_module.TrainEvaluateModels._halving_factor},
+             "depends_on": ["preprocess"],
+             "inputs": ["data/out/application_data_train_prepared", "outputs/preprocess/final_variables.csv", "outputs/preprocess/y_col_name.csv",
+                        "outputs/preprocess/preprocess_transform.json"],
+             "outputs": ["outputs/train/models/best_model", "outputs/train/feature_importance.csv",
+                         "outputs/train/metrics/train_cv_model_results.csv", "outputs/train/metrics/train_cv_model_results_best_model.csv"],
+             "code": ["3-train-evaluate-models.py", "model_search.py", "model_store.py", "forest_inference.py", "preprocess_transform.py", "dataset_io.py"]},
+            {"name": "select", "file": "4-select-best-model.py", "function": "process_select_best_model", "kwargs": {"n_jobs": n_jobs},
+             "params": {"segment_cols": select_best_model_class._segment_cols, "n_bootstrap": select_best_model_class._n_bootstrap,
+                        "confidence_level": select_best_model_class._confidence_level, "random_state": select_best_model_class._random_state},
+             "depends_on": ["split", "train", "prepare_test"],
+             "inputs": ["outputs/train/models/best_model", "outputs/train/feature_importance.csv",
+                        "data/out/application_data_train_prepared", "data/out/application_data_test_prepared",
+                        "data/out/application_data_train", "data/out/application_data_test"],
+             "outputs": ["outputs/train/metrics/train_test_metrics.csv", "outputs/train/metrics/train_test_segment_metrics.csv"],
+             "code": ["4-select-best-model.py", "auc_evaluation.py", "model_store.py", "dataset_io.py"]},
+            {"name": "score", "file": "5-score-model.py", "function": "process_score_model", "kwargs": {"inference_engine": inference_engine},
+             "params": {}, "depends_on": ["select", "prepare_test"],
+             "inputs": ["outputs/train/models/best_model", "data/out/application_data_test_prepared"],
+             "outputs": ["data/score/df_data_score_pred.csv", "data/score/y_pred_score.csv"],
+             "code": ["5-score-model.py", "artifact_cache.py", "score_server.py", "model_store.py", "forest_inference.py",
+                      "preprocess_transform.py", "dataset_io.py"]},
+        ]
+
+    def _resolve_path(self, path):
+        if os.path.exists(path):
+            return path
+        return self._dataset_io.find_dataset_path(path)
+
+    def _hash_file(self, path):
+        # Content hashes are reused while a file keeps its mtime and size, so unchanged datasets are not re-read
+        stat = os.stat(path)
+        file_stamp = [stat.st_mtime_ns, stat.st_size]
+        cached_hash = self._cache["file_hashes"].get(path)
+        if (cached_hash is not None) and (cached_hash["stamp"] == file_stamp):
+            return cached_hash["hash"]
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(self._hash_block_size), b""):
+                file_hash.update(block)
+        self._cache["file_hashes"][path] = {"stamp": file_stamp, "hash": file_hash.hexdigest()}
+        return file_hash.hexdigest()
+
+    def _hash_path(self, path):
+        resolved_path = self._resolve_path(path)
+        if resolved_path is None:
+            return None
+        if os.path.isfile(resolved_path):
+            return self._hash_file(resolved_path)
+        path_hash = hashlib.sha256()
+        for directory, _dirs, file_names in sorted(os.walk(resolved_path)):
+            for file_name in sorted(file_names):
+                file_path = os.path.join(directory, file_name)
+                path_hash.update(os.path.relpath(file_path, resolved_path).encode("utf-8"))
+                path_hash.update(self._hash_file(file_path).encode("utf-8"))
+        return path_hash.hexdigest()
+
+    def _compute_fingerprint(self, stage):
+        kwargs = {key: value for key, value in stage["kwargs"].items() if key != "n_jobs"}
+        fingerprint_content = {"kwargs": kwargs, "params": stage["params"],
+                               "inputs": {path: self._hash_path(path) for path in stage["inputs"]},
+                               "code": {file_name: self._hash_path(os.path.join(SRC_PATH, file_name)) for file_name in stage["code"]},
+                               "data_format": self._dataset_io.get_data_format()}
+        return hashlib.sha256(json.dumps(fingerprint_content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _is_up_to_date(self, stage, fingerprint):
+        stage_cache = self._cache["stages"].get(stage["name"])
+        if (stage_cache is None) or (stage_cache["fingerprint"] != fingerprint):
+            return False
+        return all(self._hash_path(path) == stage_cache["outputs"].get(path) for path in stage["outputs"])
+
+    def _record_stage(self, stage, fingerprint):
+        self._cache["stages"][stage["name"]] = {"fingerprint": fingerprint,
+                                                "outputs": {path: self._hash_path(path) for path in stage["outputs"]}}
+        self._save_cache()
+
+    def run_pipeline(self, stages, force=False, max_workers=2, profile=False):
+        stages_by_name = {stage["name"]: stage for stage in stages}
+        pending = list(stages_by_name)
+        done, report, running = set(), [], {}
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                # Stages whose dependencies are complete either hit the cache or start right away, so
+                # independent stages (test preparation and training) run side by side
+                ready = [name for name in pending if all(dependency in done for dependency in stages_by_name[name]["depends_on"])]
+                for name in ready:
+                    pending.remove(name)
+                    stage = stages_by_name[name]
+                    fingerprint = self._compute_fingerprint(stage)
+                    if (not force) and self._is_up_to_date(stage, fingerprint):
+                        report.append({"stage": name, "status": "cached", "seconds": 0.0})
+                        done.add(name)
+                    else:
+                        future = executor.submit(_run_stage, name, stage["file"], stage["function"], stage["kwargs"], profile)
+                        running[future] = (stage, fingerprint)
+                if not running:
+                    if ready:
+                        continue
+                    raise RuntimeError(f"Stages with unmet dependencies: {pending}")
+                finished, _not_finished = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, fingerprint = running.pop(future)
+                    seconds = future.result()
+                    self._record_stage(stage, fingerprint)
+                    report.append({"stage": stage["name"], "status": "ran", "seconds": seconds})
+                    done.add(stage["name"])
+
+        df_report = pd.DataFrame(report)
+        df_report.to_csv(f"{self._output_path}/pipeline_run_report.csv", index=False)
+        return df_report
+
+
+def process_run_pipeline(force, max_workers, search_strategy, n_jobs, inference_engine, profile):
+    if (os.getcwd().endswith("src")):
+        os.chdir("..")
+    pipeline_runner_instance = PipelineRunner("outputs/pipeline")
+    stages = pipeline_runner_instance.define_stages(search_strategy, n_jobs, inference_engine)
+    df_report = pipeline_runner_instance.run_pipeline(stages, force, max_workers, profile)
+    print(df_report.to_string(index=False))
+    return df_report
+
+
+def main(force=False, max_workers=2, search_strategy="grid", n_jobs=-1, inference_engine="sklearn", profile=False):
+    process_run_pipeline(force, max_workers, search_strategy, n_jobs, inference_engine, profile)
+
+if __name__ == "__main__":
+    fire.Fire(main)
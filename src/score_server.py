@@ -0,0 +1,209 @@
+import collections
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class LatencyTracker:
+    _latencies = None
+    _lock = None
+
+    def __init__(self, max_samples=100000):
+        self._latencies = collections.deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            latencies_ms = np.array(self._latencies) * 1000
+        if len(latencies_ms) == 0:
+            return {"requests": 0, "p50_ms": None, "p99_ms": None}
+        return {"requests": int(len(latencies_ms)),
+                "p50_ms": float(np.percentile(latencies_ms, 50)),
+                "p99_ms": float(np.percentile(latencies_ms, 99))}
+
+
+class MicroBatcher:
+    _score_records = None
+    _max_batch_size = 256
+    _max_wait_seconds = 0.005
+    _queue = None
+    _thread = None
+
+    def __init__(self, score_records, max_batch_size=256, max_wait_ms=5):
+        self._score_records = score_records
+        self._max_batch_size = max_batch_size
+        self._max_wait_seconds = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, records):
+        # Checked here, as anything queued is measured by the batcher thread and must not be able to stop it
+        if not isinstance(records, list):
+            raise ValueError(f"Records must be a list, got {type(records).__name__}")
+        future = Future()
+        self._queue.put((records, future))
+        return future.result()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        batch_size = len(batch[0][0])
+        deadline = time.perf_counter() + self._max_wait_seconds
+        while batch_size < self._max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            batch_size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._score_batch(batch)
+            except Exception as error:
+                # Whatever goes wrong fails only the requests of this batch still waiting, never the batcher thread
+                for _records, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _score_batch(self, batch):
+        # Every request waiting in the window is scored by one predict_proba call and the output is split back
+        records = [record for request_records, _future in batch for record in request_records]
+        try:
+            y_pred = self._score_records(records)
+        except Exception:
+            # One bad request must not fail the others it was batched with, so each is scored on its own
+            self._score_requests_separately(batch)
+            return
+        start = 0
+        for request_records, future in batch:
+            future.set_result(y_pred[start:start + len(request_records)])
+            start += len(request_records)
+
+    def _score_requests_separately(self, batch):
+        for request_records, future in batch:
+            try:
+                future.set_result(self._score_records(request_records))
+            except Exception as error:
+                future.set_exception(error)
+
+
+def _parse_records(payload):
+    if isinstance(payload, dict) and ("records" in payload):
+        records = payload["records"]
+    elif isinstance(payload, dict):
+        records = [payload]
+    else:
+        records = payload
+    if not (isinstance(records, list) and all(isinstance(record, dict) for record in records)):
+        raise ValueError("Expected a record object, a list of record objects or {\"records\": [...]}")
+    return records
+
+
+def _make_handler(micro_batcher, latency_tracker):
+    class ScoreRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            content = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path == "/stats":
+                self._send_json(200, latency_tracker.summary())
+            else:
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+                return
+            start = time.perf_counter()
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                y_pred = micro_batcher.submit(_parse_records(payload))
+            except Exception as error:
+                self._send_json(400, {"error": str(error)})
+                return
+            latency_tracker.record(time.perf_counter() - start)
+            self._send_json(200, {"y_pred": y_pred})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoreRequestHandler
+
+
+def serve_http(score_records, host="127.0.0.1", port=8080, max_batch_size=256, max_wait_ms=5):
+    latency_tracker = LatencyTracker()
+    micro_batcher = MicroBatcher(score_records, max_batch_size, max_wait_ms)
+    server = ThreadingHTTPServer((host, port), _make_handler(micro_batcher, latency_tracker))
+    print(f"Scoring server listening on http://{host}:{port} (POST /score, GET /stats)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(latency_tracker.summary()), file=sys.stderr)
+    return latency_tracker.summary()
+
+
+def serve_jsonl(score_records, input_stream=None, output_stream=None, max_batch_size=256, max_wait_ms=5, max_in_flight=1024):
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+    latency_tracker = LatencyTracker()
+    micro_batcher = MicroBatcher(score_records, max_batch_size, max_wait_ms)
+
+    def score_line(line, start):
+        y_pred = micro_batcher.submit(_parse_records(json.loads(line)))
+        latency_tracker.record(time.perf_counter() - start)
+        return y_pred
+
+    def write_responses():
+        # Responses are written in input order as soon as each is ready, so a client waiting on one line gets
+        # its answer without the reader having to see another line first. A failed line gets an error response.
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            try:
+                response = {"y_pred": future.result()}
+            except Exception as error:
+                response = {"error": str(error)}
+            output_stream.write(json.dumps(response) + "\n")
+            output_stream.flush()
+
+    # Lines are scored concurrently so the batcher can group them; the bounded queue caps the lines in flight
+    pending = queue.Queue(maxsize=max_in_flight)
+    writer = threading.Thread(target=write_responses, daemon=True)
+    writer.start()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for line in input_stream:
+            if not line.strip():
+                continue
+            pending.put(executor.submit(score_line, line, time.perf_counter()))
+        pending.put(None)
+        writer.join()
+    print(json.dumps(latency_tracker.summary()), file=sys.stderr)
+    return latency_tracker.summary()